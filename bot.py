@@ -3,17 +3,41 @@ Telegram Bot pentru rezumate de articole
 Comenzi: /scurt (250-300), /mediu (500-600), /lung (850-950)
 Batch: max 7 linkuri → rezumate scurte
 Default fără comandă: lung
+Digest: /digest linkuri → procesare asincronă prin Message Batches API (preț redus)
+CLI: python bot.py batch linkuri.txt → același pipeline, fără Telegram
+/stop: oprește procesarea în curs din chat (rezultatele parțiale sunt livrate)
 """
 
 import os
 import re
+import sys
+import asyncio
+import time
+import codecs
+import json
+import hashlib
 import logging
-from urllib.parse import urlparse
+import logging.handlers
+import argparse
+import contextvars
+import secrets
+import difflib
+import threading
+from pathlib import Path
+from contextlib import contextmanager
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlparse, urlunparse, parse_qsl, urlencode, urljoin, unquote_plus
 from telegram import Update, MessageEntity
 from telegram.ext import Application, MessageHandler, CommandHandler, filters, ContextTypes
 from telegram.constants import ParseMode
+from telegram.error import TelegramError
+from telegram.request import HTTPXRequest
 import anthropic
 import trafilatura
+from trafilatura.xml import xmltotxt
+import httpx
+import lxml.html
 
 # Configurare logging
 logging.basicConfig(
@@ -37,6 +61,253 @@ LENGTH_CONFIG = {
 }
 
 MAX_BATCH_LINKS = 7
+SUMMARY_MODEL = "claude-sonnet-4-20250514"
+SUMMARY_INPUT_CHARS = 15000  # cât din articol ajunge la LLM (și în amprenta de duplicate)
+
+BATCH_CONCURRENCY = int(os.getenv("BATCH_CONCURRENCY", "4"))
+
+# Termen limită end-to-end pentru fiecare update (descărcare + extragere + rezumat)
+UPDATE_DEADLINE_SECONDS = float(os.getenv("UPDATE_DEADLINE_SECONDS", "150"))
+LLM_MIN_ATTEMPT_SECONDS = float(os.getenv("LLM_MIN_ATTEMPT_SECONDS", "30"))  # sub atât, fără reîncercări
+# Rezultate care nu sunt rezumate: erori, timp expirat, oprite prin /stop
+FAILURE_MARKERS = ('❌', '⏱️', '⏹️')
+
+# Comasare: linkurile trimise în mesaje consecutive devin un singur batch
+COALESCE_WINDOW_SECONDS = float(os.getenv("COALESCE_WINDOW_SECONDS", "0"))  # 0 = dezactivat
+COALESCE_MAX_WAIT = float(os.getenv("COALESCE_MAX_WAIT", "30"))
+
+# Digest offline prin Message Batches API
+MAX_DIGEST_LINKS = int(os.getenv("MAX_DIGEST_LINKS", "50"))
+DIGEST_POLL_INTERVAL = float(os.getenv("DIGEST_POLL_INTERVAL", "60"))
+DIGEST_MAX_WAIT = float(os.getenv("DIGEST_MAX_WAIT", str(24 * 3600)))
+
+# Limite pentru descărcarea articolelor
+MAX_DOWNLOAD_BYTES = int(os.getenv("MAX_DOWNLOAD_BYTES", str(2 * 1024 * 1024)))
+DOWNLOAD_TIMEOUT = float(os.getenv("DOWNLOAD_TIMEOUT", "20"))
+HTML_CONTENT_TYPES = ('text/html', 'application/xhtml+xml')
+JINA_CONTENT_TYPES = ('text/plain', 'text/markdown')
+
+# Extragere pe niveluri: rapid (selector per domeniu / trafilatura fără fallback) → complet
+EXTRACT_MIN_CHARS = int(os.getenv("EXTRACT_MIN_CHARS", "400"))
+EXTRACTION_SELECTORS_FILE = os.getenv("EXTRACTION_SELECTORS_FILE", "")  # JSON {domeniu: xpath}
+EXTRACTION_PROFILES_SIZE = 1000
+BOILERPLATE_PATTERN = re.compile(
+    r'cookie|abonea|urmărește-ne|citește și|citeste si|distribuie|comentari|toate drepturile|'
+    r'all rights reserved|subscribe|read more|подпис|читайте также', re.IGNORECASE
+)
+
+# Index persistent alias → URL canonic
+URL_INDEX_PATH = os.getenv("URL_INDEX_PATH", "url_index.json")
+URL_INDEX_SIZE = int(os.getenv("URL_INDEX_SIZE", "5000"))
+TRACKING_PARAMS = {'fbclid', 'gclid', 'dclid', 'gbraid', 'wbraid', 'yclid', 'msclkid', 'igshid', 'igsh',
+                   'mc_cid', 'mc_eid', '_ga', '_gl', 'ref', 'ref_src', 'ref_url', 'cmpid', 'ncid', 'spm'}
+TRACKING_PARAM_PREFIXES = ('utm_', 'pk_')
+
+# Prefetch: descărcarea articolelor pornește imediat ce linkurile ajung la bot
+PREFETCH_TTL = float(os.getenv("PREFETCH_TTL", "600"))
+PREFETCH_MAX_ENTRIES = int(os.getenv("PREFETCH_MAX_ENTRIES", "200"))
+PREFETCH_MAX_PER_MESSAGE = int(os.getenv("PREFETCH_MAX_PER_MESSAGE", "10"))
+PREFETCH_MAX_PER_CHAT_MINUTE = int(os.getenv("PREFETCH_MAX_PER_CHAT_MINUTE", "30"))
+PREFETCH_CONCURRENCY = int(os.getenv("PREFETCH_CONCURRENCY", "4"))
+
+# Detectare știri duplicate (aceeași știre de agenție pe mai multe portaluri)
+DUPLICATE_MAX_DISTANCE = int(os.getenv("DUPLICATE_MAX_DISTANCE", "6"))  # biți diferiți din 64; -1 dezactivează
+SUMMARY_INDEX_SIZE = int(os.getenv("SUMMARY_INDEX_SIZE", "500"))
+DUPLICATE_MIN_WORDS = 60
+
+# Tracing: un trace per update Telegram, scris ca JSONL (format compatibil OpenTelemetry)
+TRACE_LOG_PATH = os.getenv("TRACE_LOG_PATH", "traces.jsonl")  # gol = dezactivat
+TRACE_LOG_MAX_BYTES = int(os.getenv("TRACE_LOG_MAX_BYTES", str(10 * 1024 * 1024)))
+TRACE_LOG_BACKUPS = int(os.getenv("TRACE_LOG_BACKUPS", "3"))
+
+DOWNLOAD_HEADERS = {
+    "User-Agent": "Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/124.0 Safari/537.36",
+    "Accept": "text/html,application/xhtml+xml;q=0.9,*/*;q=0.5",
+}
+
+
+# Logger separat pentru span-uri - o linie JSON per span, fișier rotativ
+trace_logger = logging.getLogger("trace")
+trace_logger.propagate = False
+trace_logger.setLevel(logging.INFO)
+if TRACE_LOG_PATH:
+    trace_handler = logging.handlers.RotatingFileHandler(
+        TRACE_LOG_PATH, maxBytes=TRACE_LOG_MAX_BYTES, backupCount=TRACE_LOG_BACKUPS, encoding='utf-8', delay=True
+    )
+    trace_handler.setFormatter(logging.Formatter('%(message)s'))
+    trace_logger.addHandler(trace_handler)
+
+current_span = contextvars.ContextVar("current_span", default=None)
+current_deadline = contextvars.ContextVar("current_deadline", default=None)  # time.monotonic() sau None
+current_chat_id = contextvars.ContextVar("current_chat_id", default=None)
+current_update_id = contextvars.ContextVar("current_update_id", default=None)
+
+
+def remaining_time() -> float | None:
+    """Secundele rămase până la termenul limită al update-ului curent (None = fără termen)."""
+    deadline = current_deadline.get()
+    return None if deadline is None else deadline - time.monotonic()
+
+
+def otlp_attributes(attributes: dict) -> list:
+    """Convertește atributele în forma OTLP/JSON: [{"key": ..., "value": {"stringValue": ...}}]."""
+    converted = []
+    for key, value in attributes.items():
+        if value is None:
+            continue
+        if isinstance(value, bool):
+            typed = {"boolValue": value}
+        elif isinstance(value, int):
+            typed = {"intValue": str(value)}
+        elif isinstance(value, float):
+            typed = {"doubleValue": value}
+        else:
+            typed = {"stringValue": str(value)}
+        converted.append({"key": key, "value": typed})
+    return converted
+
+
+@contextmanager
+def trace_span(name: str, **attributes):
+    """Deschide un span copil al span-ului curent (sau un trace nou, dacă nu există).
+    
+    Span-ul e un dict; atributele se pot completa pe parcurs prin span["attributes"].
+    La ieșire e scris în TRACE_LOG_PATH, cu status ERROR dacă a apărut o excepție.
+    """
+    parent = current_span.get()
+    span = {
+        "traceId": parent["traceId"] if parent else secrets.token_hex(16),
+        "spanId": secrets.token_hex(8),
+        "parentSpanId": parent["spanId"] if parent else "",
+        "name": name,
+        "startTimeUnixNano": time.time_ns(),
+        "attributes": dict(attributes),
+    }
+    token = current_span.set(span)
+    status = {"code": "STATUS_CODE_OK"}
+    try:
+        yield span
+    except BaseException as e:
+        status = {"code": "STATUS_CODE_ERROR", "message": f"{type(e).__name__}: {str(e)[:200]}"}
+        raise
+    finally:
+        current_span.reset(token)
+        if trace_logger.handlers:
+            record = dict(span, endTimeUnixNano=time.time_ns(), status=status,
+                          attributes=otlp_attributes(span["attributes"]))
+            record["startTimeUnixNano"] = str(record["startTimeUnixNano"])
+            record["endTimeUnixNano"] = str(record["endTimeUnixNano"])
+            trace_logger.info(json.dumps(record, ensure_ascii=False))
+
+
+def set_span_attributes(**attributes):
+    """Adaugă atribute la span-ul curent (dacă există)."""
+    span = current_span.get()
+    if span:
+        span["attributes"].update(attributes)
+
+
+def read_trace_spans(path: str) -> list:
+    """Citește toate span-urile din fișierul de trace și din backup-urile rotite."""
+    spans = []
+    for candidate in [f"{path}.{i}" for i in range(TRACE_LOG_BACKUPS, 0, -1)] + [path]:
+        try:
+            with open(candidate, encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        spans.append(json.loads(line))
+                    except ValueError:
+                        pass
+        except FileNotFoundError:
+            pass
+    return spans
+
+
+def format_trace_waterfall(trace_id: str, spans: list, width: int = 40) -> str:
+    """Construiește vizualizarea cascadă (waterfall) a unui trace."""
+    spans = [span for span in spans if span["traceId"] == trace_id]
+    if not spans:
+        return f"Trace {trace_id} nu a fost găsit."
+    
+    start = min(int(span["startTimeUnixNano"]) for span in spans)
+    end = max(int(span["endTimeUnixNano"]) for span in spans)
+    total = max(end - start, 1)
+    children = {}
+    for span in spans:
+        children.setdefault(span["parentSpanId"], []).append(span)
+    known_ids = {span["spanId"] for span in spans}
+    roots = [span for span in spans if span["parentSpanId"] not in known_ids]
+    
+    lines = [f"Trace {trace_id} - {total / 1e6:.0f} ms"]
+    
+    def render(span, depth):
+        span_start = int(span["startTimeUnixNano"]) - start
+        duration = int(span["endTimeUnixNano"]) - int(span["startTimeUnixNano"])
+        offset = int(span_start / total * width)
+        bar = ' ' * offset + '█' * max(1, int(duration / total * width))
+        error = " ❌" if span["status"]["code"] == "STATUS_CODE_ERROR" else ""
+        attributes = ", ".join(
+            f"{a['key']}={next(iter(a['value'].values()))}" for a in span["attributes"]
+        )
+        lines.append(f"{span_start / 1e6:8.0f} ms {duration / 1e6:8.0f} ms |{bar:<{width}}| "
+                     f"{'  ' * depth}{span['name']}{error} {attributes}".rstrip())
+        for child in sorted(children.get(span["spanId"], []), key=lambda c: int(c["startTimeUnixNano"])):
+            render(child, depth + 1)
+    
+    for root in sorted(roots, key=lambda r: int(r["startTimeUnixNano"])):
+        render(root, 0)
+    return "\n".join(lines)
+
+
+def format_recent_traces(spans: list, limit: int = 20) -> str:
+    """Listează cele mai recente trace-uri (span-urile rădăcină)."""
+    roots = sorted((span for span in spans if not span["parentSpanId"]),
+                   key=lambda span: int(span["startTimeUnixNano"]))[-limit:]
+    if not roots:
+        return "Nu există trace-uri."
+    lines = []
+    for span in roots:
+        started = time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(int(span["startTimeUnixNano"]) / 1e9))
+        duration = (int(span["endTimeUnixNano"]) - int(span["startTimeUnixNano"])) / 1e6
+        lines.append(f"{span['traceId']}  {started}  {duration:8.0f} ms  {span['name']}")
+    return "\n".join(lines)
+
+
+class TracedHTTPXRequest(HTTPXRequest):
+    """Cereri către Telegram Bot API, fiecare într-un span propriu."""
+    
+    async def do_request(self, url: str, method: str, *args, **kwargs):
+        # URL-ul conține token-ul botului - păstrăm doar numele metodei API
+        with trace_span("telegram.api", **{"telegram.method": url.rsplit('/', 1)[-1]}) as span:
+            status_code, payload = await super().do_request(url, method, *args, **kwargs)
+            span["attributes"]["http.status_code"] = status_code
+            return status_code, payload
+
+
+class TracedApplication(Application):
+    """Application care deschide câte un trace și fixează termenul limită pentru fiecare update."""
+    
+    async def process_update(self, update: object) -> None:
+        attributes = {}
+        if isinstance(update, Update):
+            attributes["telegram.update_id"] = update.update_id
+            if update.effective_chat:
+                attributes["telegram.chat_id"] = update.effective_chat.id
+            text = update.effective_message.text if update.effective_message else None
+            if text and text.startswith('/'):
+                attributes["telegram.command"] = text.split()[0]
+        deadline_token = current_deadline.set(time.monotonic() + UPDATE_DEADLINE_SECONDS)
+        chat_token = current_chat_id.set(attributes.get("telegram.chat_id"))
+        update_token = current_update_id.set(attributes.get("telegram.update_id"))
+        with trace_span("telegram.update", **attributes) as span:
+            try:
+                await super().process_update(update)
+            finally:
+                current_deadline.reset(deadline_token)
+                current_chat_id.reset(chat_token)
+                current_update_id.reset(update_token)
+                duration = (time.time_ns() - span["startTimeUnixNano"]) / 1e9
+                logger.info(f"Trace {span['traceId']}: update procesat în {duration:.1f}s")
 
 
 def get_prompt(length_type: str, has_url: bool) -> str:
@@ -106,6 +377,185 @@ def clean_telegram_footer(text: str) -> str:
     return cleaned_text.strip()
 
 
+def domain_matches(host: str, domains: list) -> bool:
+    """Verifică dacă host-ul e unul dintre domenii sau un subdomeniu al lor ('x.com' nu prinde 'box.com')."""
+    host = host.lower().rstrip('.')
+    return any(host == domain or host.endswith('.' + domain) for domain in domains)
+
+
+def is_tracking_param(segment: str) -> bool:
+    """True pentru o pereche cheie=valoare din query care ține doar de tracking."""
+    key = unquote_plus(segment.split('=', 1)[0]).lower()
+    return key in TRACKING_PARAMS or key.startswith(TRACKING_PARAM_PREFIXES)
+
+
+def clean_url(url: str) -> str:
+    """Elimină parametrii de tracking și fragmentul, normalizează host-ul. Rezultatul rămâne descărcabil.
+    
+    Restul query-ului rămâne neatins, octet cu octet: unele site-uri disting
+    între ?id și ?id= sau între %20 și +. URL-urile cu port invalid sunt
+    întoarse nemodificate (filter_article_urls le elimină).
+    """
+    url = url.strip()
+    parsed = urlparse(url)
+    try:
+        port = parsed.port
+    except ValueError:
+        return url
+    host = (parsed.hostname or '').lower().rstrip('.')
+    if port and not (parsed.scheme == 'http' and port == 80 or parsed.scheme == 'https' and port == 443):
+        host = f"{host}:{port}"
+    query = '&'.join(segment for segment in parsed.query.split('&') if segment and not is_tracking_param(segment))
+    path = re.sub(r'/{2,}', '/', parsed.path) or '/'
+    return urlunparse((parsed.scheme.lower(), host, path, parsed.params, query, ''))
+
+
+def url_key(url: str) -> str:
+    """Identitatea unui URL: fără www./m./amp., fără variante AMP și slash final, parametri sortați.
+    
+    Folosită doar pentru comparații și chei de cache, nu pentru descărcare.
+    """
+    parsed = urlparse(clean_url(url))
+    host = parsed.netloc
+    for prefix in ('www.', 'm.', 'amp.', 'mobile.'):
+        if host.startswith(prefix) and '.' in host[len(prefix):]:
+            host = host[len(prefix):]
+            break
+    path = re.sub(r'(/amp|\.amp)/?$', '', parsed.path).rstrip('/') or '/'
+    query = sorted(
+        (key, value) for key, value in parse_qsl(parsed.query, keep_blank_values=True)
+        if key != 'amp' and not (key == 'outputType' and value == 'amp')
+    )
+    return urlunparse(('https', host, path, parsed.params, urlencode(query), ''))
+
+
+def find_canonical_link(html: str, page_url: str) -> str | None:
+    """Extrage <link rel="canonical"> dacă indică același site și nu o pagină-părinte.
+    
+    Multe portaluri pun pe articole canonical-ul secțiunii sau al versiunii de
+    limbă (ex. /ro/ pentru /ro/stiri/123) - acela nu identifică articolul.
+    """
+    for tag in re.findall(r'<link\b[^>]*>', html[:200000], re.IGNORECASE):
+        if not re.search(r'rel=["\']?canonical\b', tag, re.IGNORECASE):
+            continue
+        href = re.search(r'href=["\']([^"\']+)["\']', tag, re.IGNORECASE)
+        if not href:
+            return None
+        canonical = urljoin(page_url, href.group(1).strip())
+        if not canonical.startswith(('http://', 'https://')):
+            return None
+        canonical_parsed = urlparse(url_key(canonical))
+        page_parsed = urlparse(url_key(page_url))
+        if canonical_parsed.netloc != page_parsed.netloc:
+            return None
+        canonical_segments = [segment for segment in canonical_parsed.path.split('/') if segment]
+        page_segments = [segment for segment in page_parsed.path.split('/') if segment]
+        if len(canonical_segments) < len(page_segments) and page_segments[:len(canonical_segments)] == canonical_segments:
+            return None
+        return clean_url(canonical)
+    return None
+
+
+class UrlAliasIndex:
+    """Index persistent (JSON) alias → URL canonic, limitat ca mărime.
+    
+    Se completează la descărcare (redirect-uri, <link rel=canonical>), astfel
+    încât variantele aceluiași articol ajung la aceeași identitate. Indexul
+    servește doar identității (deduplicare, chei de cache); se descarcă
+    întotdeauna URL-ul primit.
+    
+    Un canonical declarat de pagină e acceptat doar cât timp o singură pagină
+    îl declară; dacă îl declară și alta, e un canonical de secțiune sau de
+    șablon și e blocat definitiv, iar aliasurile spre el sunt șterse.
+    """
+    
+    def __init__(self, path: str, max_size: int):
+        self.path = path
+        self.max_size = max_size
+        self.lock = threading.Lock()
+        self.aliases = OrderedDict()  # url_key(alias) -> URL canonic
+        self.declared = OrderedDict()  # url_key(canonical declarat) -> url_key(pagina care l-a declarat), "" = blocat
+        try:
+            with open(path, encoding='utf-8') as f:
+                data = json.load(f)
+            if isinstance(data.get("aliases"), dict):
+                self.aliases.update(data["aliases"])
+                self.declared.update(data.get("declared", {}))
+            else:
+                self.aliases.update(data)  # format vechi: doar aliasurile
+            logger.info(f"Index URL încărcat: {len(self.aliases)} aliasuri")
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError) as e:
+            logger.warning(f"Index URL ilizibil, pornesc gol: {e}")
+    
+    def resolve(self, url: str) -> str:
+        """URL-ul canonic cunoscut pentru url, altfel url curățat."""
+        with self.lock:
+            return self.aliases.get(url_key(url), clean_url(url))
+    
+    def record(self, alias: str, canonical: str):
+        canonical = clean_url(canonical)
+        keys = {url_key(alias), url_key(canonical)}
+        with self.lock:
+            if all(self.aliases.get(key) == canonical for key in keys):
+                return
+            for key in keys:
+                self.aliases[key] = canonical
+                self.aliases.move_to_end(key)
+            while len(self.aliases) > self.max_size:
+                self.aliases.popitem(last=False)
+            self._save()
+        logger.info(f"🔗 Alias: {alias[:60]} → {canonical[:60]}")
+    
+    def accept_declared(self, page_url: str, canonical: str) -> bool:
+        """True dacă canonical-ul declarat de page_url poate fi folosit ca identitate."""
+        canonical_key, page_key = url_key(canonical), url_key(page_url)
+        if canonical_key == page_key:
+            return True
+        with self.lock:
+            owner = self.declared.get(canonical_key)
+            if owner == page_key:
+                return True
+            if owner is None:
+                self.declared[canonical_key] = page_key
+                while len(self.declared) > self.max_size:
+                    self.declared.popitem(last=False)
+                self._save()
+                return True
+            if owner:
+                # A doua pagină distinctă cu același canonical - nu identifică niciun articol
+                self.declared[canonical_key] = ""
+                for key in [key for key, target in self.aliases.items()
+                            if key != canonical_key and url_key(target) == canonical_key]:
+                    del self.aliases[key]
+                self._save()
+                logger.warning(f"🔗 Canonical comun mai multor pagini, ignorat: {canonical[:60]}")
+            return False
+    
+    def _save(self):
+        if not self.path:
+            return
+        tmp_path = f"{self.path}.tmp"
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump({"aliases": self.aliases, "declared": self.declared}, f, ensure_ascii=False)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            logger.warning(f"Nu pot salva indexul URL: {e}")
+
+
+url_aliases = UrlAliasIndex(URL_INDEX_PATH, URL_INDEX_SIZE)
+
+
+def dedupe_urls(urls: list) -> list:
+    """Păstrează o singură apariție per identitate canonică (prima, curățată), în ordine."""
+    unique = {}
+    for url in urls:
+        unique.setdefault(url_key(url_aliases.resolve(url)), clean_url(url))
+    return list(unique.values())
+
+
 def extract_urls_from_entities(message) -> list:
     """Extrage URL-uri din mesaj."""
     urls = []
@@ -121,7 +571,7 @@ def extract_urls_from_entities(message) -> list:
     text_urls = re.findall(r'https?://[^\s<>"{}|\\^`\[\]]+', text)
     urls.extend(text_urls)
     
-    return list(dict.fromkeys(urls))  # Unique, păstrează ordinea
+    return dedupe_urls(urls)  # Unique după identitatea canonică, păstrează ordinea
 
 
 def filter_article_urls(urls: list) -> list:
@@ -133,8 +583,10 @@ def filter_article_urls(urls: list) -> list:
     article_urls = []
     for url in urls:
         try:
-            domain = urlparse(url).netloc.lower()
-            if not any(ignore in domain for ignore in ignore_domains):
+            parsed = urlparse(url)
+            parsed.port  # ValueError pentru porturi invalide - linkul nu poate fi descărcat
+            domain = parsed.hostname or ''
+            if domain and not domain_matches(domain, ignore_domains):
                 article_urls.append(url)
         except:
             pass
@@ -211,58 +663,483 @@ def format_summary_html(summary: str, url: str = None) -> str:
     return f"{emoji_part} {formatted_text}" if emoji_part else formatted_text
 
 
-def fetch_article_content(url: str) -> str | None:
-    """Descarcă și extrage conținutul unui articol."""
+class DownloadRejected(Exception):
+    """Răspunsul nu e un articol (tip greșit sau prea mare) - nu are rost să reîncercăm."""
+
+
+def detect_charset(response: httpx.Response, first_chunk: bytes) -> str:
+    """Determină encoding-ul din header sau din <meta charset> (default utf-8)."""
+    candidates = [response.charset_encoding]
+    meta = re.search(rb'<meta[^>]+charset=["\']?([\w-]+)', first_chunk[:4096], re.IGNORECASE)
+    if meta:
+        candidates.append(meta.group(1).decode('ascii', 'ignore'))
+    for charset in candidates:
+        if not charset:
+            continue
+        try:
+            codecs.lookup(charset)
+            return charset
+        except LookupError:
+            pass
+    return 'utf-8'
+
+
+def download_text(url: str, allowed_types: tuple = HTML_CONTENT_TYPES, max_bytes: int = MAX_DOWNLOAD_BYTES) -> tuple:
+    """Descarcă un răspuns în flux, cu limită de mărime și de timp.
+
+    Verifică Content-Type și Content-Length înainte de a citi corpul și
+    decodează incremental, astfel încât în memorie ajung cel mult max_bytes.
+    Returnează (text, URL final după redirect-uri). Ridică DownloadRejected
+    pentru tip/mărime nepotrivită, întoarce (None, url) pentru erori de
+    rețea, HTTP != 200 sau răspunsuri prea lente.
+    """
+    # Bugetul de timp: DOWNLOAD_TIMEOUT, dar nu peste termenul limită al update-ului
+    budget = DOWNLOAD_TIMEOUT
+    remaining = remaining_time()
+    if remaining is not None:
+        if remaining <= 0:
+            logger.warning(f"Termen limită depășit, nu mai descarc: {url[:60]}")
+            return None, url
+        budget = min(budget, remaining)
+    
+    with trace_span("http.download", **{"http.url": url[:200]}) as span:
+        deadline = time.monotonic() + budget
+        timeout = httpx.Timeout(budget, connect=min(10.0, budget))
+        try:
+            with httpx.stream("GET", url, headers=DOWNLOAD_HEADERS, timeout=timeout, follow_redirects=True) as response:
+                if response.status_code != 200:
+                    span["attributes"]["http.status_code"] = response.status_code
+                    logger.warning(f"HTTP {response.status_code}: {url[:60]}")
+                    return None, url
+            
+                span["attributes"]["http.status_code"] = response.status_code
+                content_type = response.headers.get("content-type", "").split(";")[0].strip().lower()
+                span["attributes"]["http.content_type"] = content_type
+                if content_type and content_type not in allowed_types:
+                    raise DownloadRejected(f"Content-Type {content_type}")
+            
+                content_length = response.headers.get("content-length", "")
+                if content_length.isdigit() and int(content_length) > max_bytes:
+                    raise DownloadRejected(f"Content-Length {content_length} > {max_bytes}")
+            
+                decoder = None
+                parts = []
+                received = 0
+                for chunk in response.iter_bytes():
+                    received += len(chunk)
+                    if received > max_bytes:
+                        raise DownloadRejected(f"corp > {max_bytes} bytes")
+                    if time.monotonic() > deadline:
+                        span["attributes"]["download.outcome"] = "too_slow"
+                        logger.warning(f"Descărcare prea lentă ({received} bytes în {budget:.0f}s): {url[:60]}")
+                        return None, url
+                    if decoder is None:
+                        decoder = codecs.getincrementaldecoder(detect_charset(response, chunk))(errors='replace')
+                    parts.append(decoder.decode(chunk))
+                if decoder is not None:
+                    parts.append(decoder.decode(b'', final=True))
+                span["attributes"]["http.response_bytes"] = received
+                return ''.join(parts), str(response.url)
+        except httpx.HTTPError as e:
+            logger.warning(f"Descărcare eșuată: {type(e).__name__}: {str(e)[:50]}")
+            return None, url
+
+
+def load_extraction_selectors(path: str) -> dict:
+    """Încarcă selectorii XPath per domeniu (JSON {domeniu: xpath})."""
+    if not path:
+        return {}
+    try:
+        with open(path, encoding='utf-8') as f:
+            selectors = json.load(f)
+        logger.info(f"Selectori de extragere încărcați pentru {len(selectors)} domenii")
+        return selectors
+    except (OSError, ValueError) as e:
+        logger.warning(f"Nu pot citi selectorii de extragere: {e}")
+        return {}
+
+
+EXTRACTION_SELECTORS = load_extraction_selectors(EXTRACTION_SELECTORS_FILE)
+
+
+def extraction_quality_ok(text: str | None, link_density: float = 0.0) -> bool:
+    """Verifică dacă textul extras arată a articol: lungime, densitate de linkuri, proporție de boilerplate."""
+    if not text or len(text) < EXTRACT_MIN_CHARS or link_density > 0.3:
+        return False
+    lines = [line.strip() for line in text.split('\n') if line.strip()]
+    short_lines = sum(1 for line in lines if len(line) < 40)
+    boilerplate_lines = sum(1 for line in lines if len(line) < 150 and BOILERPLATE_PATTERN.search(line))
+    return short_lines / len(lines) <= 0.5 and boilerplate_lines / len(lines) <= 0.2
+
+
+def extract_with_selector(html: str, xpath: str) -> tuple:
+    """Extrage textul nodurilor găsite de selectorul XPath. Returnează (text, densitatea linkurilor)."""
     try:
-        # Metoda 1: Trafilatura standard
-        downloaded = trafilatura.fetch_url(url)
-        if downloaded:
-            content = trafilatura.extract(downloaded, include_comments=False, include_tables=False, no_fallback=False)
-            if content and len(content) > 100:
-                return content
+        tree = lxml.html.fromstring(html)
+        nodes = tree.xpath(xpath)
+    except (lxml.etree.LxmlError, ValueError) as e:
+        logger.warning(f"Selector invalid {xpath}: {e}")
+        return None, 0.0
+    
+    paragraphs = []
+    total_chars = 0
+    link_chars = 0
+    for node in nodes:
+        if not isinstance(node, lxml.html.HtmlElement):
+            continue
+        for junk in node.xpath('.//script|.//style|.//noscript|.//figure|.//aside'):
+            junk.drop_tree()
+        total_chars += len(node.text_content())
+        link_chars += sum(len(link.text_content()) for link in node.iter('a'))
+        blocks = [el.text_content().strip() for el in node.iter('p', 'h2', 'h3', 'li', 'blockquote')]
+        blocks = [block for block in blocks if block] or [node.text_content().strip()]
+        paragraphs.extend(re.sub(r'\s+', ' ', block) for block in blocks)
+    
+    text = '\n'.join(paragraphs)
+    return text or None, (link_chars / total_chars if total_chars else 0.0)
+
+
+def extract_with_trafilatura(html: str, **options) -> tuple:
+    """Extrage cu trafilatura păstrând linkurile doar cât să le măsurăm. Returnează (text, densitatea linkurilor).
+    
+    Textul e același ca la trafilatura.extract(); linkurile sunt scoase din
+    arbore după ce le-am numărat caracterele.
+    """
+    document = trafilatura.bare_extraction(html, include_links=True, with_metadata=False, **options)
+    if not document:
+        return None, 0.0
+    body = document['body']
+    total_chars = len(''.join(body.itertext()))
+    link_chars = sum(len(''.join(link.itertext())) for link in body.iter('ref'))
+    lxml.etree.strip_tags(body, 'ref')
+    text = xmltotxt(body, False)
+    return text or None, (link_chars / total_chars if total_chars else 0.0)
+
+
+def run_extraction_tier(tier: str, html: str, domain: str) -> tuple:
+    """Rulează un nivel de extragere. Returnează (text, densitatea linkurilor)."""
+    if tier == "selector":
+        return extract_with_selector(html, EXTRACTION_SELECTORS[domain])
+    if tier == "fast":
+        return extract_with_trafilatura(html, include_comments=False, include_tables=False,
+                                        no_fallback=True, favor_precision=True)
+    return extract_with_trafilatura(html, include_comments=False, include_tables=False, no_fallback=False)
+
+
+class ExtractionProfiles:
+    """Învață per domeniu ce niveluri rapide de extragere funcționează.
+    
+    Un nivel care eșuează constant pe un domeniu e sărit, dar reîncercat
+    periodic, ca profilul să se adapteze dacă site-ul se schimbă.
+    """
+    
+    RETRY_EVERY = 20
+    
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self.profiles = OrderedDict()  # domeniu -> {nivel: [reușite, eșecuri, sărite]}
+        self.lock = threading.Lock()
+    
+    def _stats(self, domain: str, tier: str) -> list:
+        profile = self.profiles.setdefault(domain, {})
+        self.profiles.move_to_end(domain)
+        while len(self.profiles) > self.max_size:
+            self.profiles.popitem(last=False)
+        return profile.setdefault(tier, [0, 0, 0])
+    
+    def should_try(self, domain: str, tier: str) -> bool:
+        with self.lock:
+            stats = self._stats(domain, tier)
+            ok, failed, _ = stats
+            if failed >= 3 and failed > 2 * ok:
+                stats[2] += 1
+                return stats[2] % self.RETRY_EVERY == 0
+            return True
+    
+    def record(self, domain: str, tier: str, success: bool):
+        with self.lock:
+            self._stats(domain, tier)[0 if success else 1] += 1
+
+
+extraction_profiles = ExtractionProfiles(EXTRACTION_PROFILES_SIZE)
+
+
+def extraction_tiers(domain: str) -> list:
+    """Nivelurile rapide disponibile pentru un domeniu, în ordinea încercării."""
+    return (["selector"] if domain in EXTRACTION_SELECTORS else []) + ["fast"]
+
+
+def selector_domain(url: str) -> str:
+    """Domeniul din EXTRACTION_SELECTORS care se potrivește URL-ului (sau host-ul normalizat)."""
+    host = urlparse(url_key(url)).hostname or ''
+    for domain in EXTRACTION_SELECTORS:
+        if domain_matches(host, [domain]):
+            return domain
+    return host
+
+
+def extract_article_text(html: str, url: str) -> str | None:
+    """Extrage textul articolului pe niveluri: întâi rapid, apoi lanțul complet de fallback.
+    
+    Nivelurile rapide sunt acceptate doar dacă trec verificările de calitate;
+    altfel se escaladează la trafilatura cu no_fallback=False (cel mai lent).
+    """
+    domain = selector_domain(url)
+    for tier in extraction_tiers(domain):
+        if not extraction_profiles.should_try(domain, tier):
+            continue
+        with trace_span("extract", **{"extract.tier": tier, "extract.html_chars": len(html)}) as span:
+            text, link_density = run_extraction_tier(tier, html, domain)
+            success = extraction_quality_ok(text, link_density)
+            span["attributes"].update({"extract.text_chars": len(text or ""), "extract.quality_ok": success})
+        extraction_profiles.record(domain, tier, success)
+        if success:
+            return text
+    
+    with trace_span("extract", **{"extract.tier": "full", "extract.html_chars": len(html)}) as span:
+        text, _ = run_extraction_tier("full", html, domain)
+        span["attributes"]["extract.text_chars"] = len(text or "")
+    return text
+
+
+def benchmark_extraction(corpus_dir: str, repeat: int = 3) -> str:
+    """Compară nivelurile de extragere pe un corpus de pagini HTML salvate (*.html).
+    
+    Pentru fiecare pagină și nivel: timpul (cel mai bun din `repeat` rulări),
+    lungimea, verificarea de calitate și similaritatea cu nivelul complet.
+    Domeniul paginii se ia din <link rel=canonical> / og:url sau din numele
+    fișierului (ex. newsmaker.md_123.html).
+    """
+    files = sorted(Path(corpus_dir).glob('*.html'))
+    if not files:
+        return f"Nu există fișiere .html în {corpus_dir}"
+    
+    lines = [f"{'fișier':<32} {'nivel':<9} {'ms':>8} {'caractere':>9} {'calitate':>8} {'similar':>8}"]
+    totals = {}
+    for path in files:
+        html = path.read_text(encoding='utf-8', errors='replace')
+        page_url = re.search(r'<(?:link[^>]+rel=["\']canonical["\'][^>]+href|meta[^>]+property=["\']og:url["\'][^>]+content)=["\']([^"\']+)', html)
+        url = page_url.group(1) if page_url else f"https://{path.stem.split('_')[0]}/"
+        domain = selector_domain(url)
+        
+        results = {}
+        for tier in extraction_tiers(domain) + ["full"]:
+            best = None
+            for _ in range(repeat):
+                started = time.perf_counter()
+                text, link_density = run_extraction_tier(tier, html, domain)
+                elapsed = time.perf_counter() - started
+                best = elapsed if best is None else min(best, elapsed)
+            results[tier] = (best, text or "", extraction_quality_ok(text, link_density))
         
-        # Metoda 2: Fallback Jina AI - pentru ORICE site care eșuează
-        logger.info(f"Trafilatura eșuat, încerc Jina AI pentru: {url[:60]}")
+        reference = results["full"][1].split()
+        for tier, (elapsed, text, quality) in results.items():
+            similarity = difflib.SequenceMatcher(None, text.split(), reference, autojunk=False).ratio() if reference else 0.0
+            lines.append(f"{path.name[:32]:<32} {tier:<9} {elapsed * 1000:8.1f} {len(text):9d} "
+                         f"{'da' if quality else 'nu':>8} {similarity:8.2f}")
+            tier_totals = totals.setdefault(tier, [0, 0.0, 0, 0.0])
+            tier_totals[0] += 1
+            tier_totals[1] += elapsed
+            tier_totals[2] += quality
+            tier_totals[3] += similarity
+    
+    lines.append("")
+    lines.append(f"{'nivel':<9} {'pagini':>6} {'ms mediu':>9} {'calitate':>9} {'similar mediu':>14}")
+    for tier, (count, elapsed, quality, similarity) in totals.items():
+        lines.append(f"{tier:<9} {count:6d} {elapsed / count * 1000:9.1f} {quality / count:9.0%} {similarity / count:14.2f}")
+    return "\n".join(lines)
+
+
+def fetch_article_content(url: str) -> str | None:
+    """Descarcă și extrage conținutul unui articol."""
+    with trace_span("article.fetch", **{"article.url": url[:200]}) as fetch_span:
         try:
-            import httpx
-            jina_url = f"https://r.jina.ai/{url}"
-            response = httpx.get(jina_url, timeout=20.0, follow_redirects=True)
-            if response.status_code == 200:
-                content = response.text
-                # Curăță markdown headers și formatare excesivă
-                content = re.sub(r'^#+\s+', '', content, flags=re.MULTILINE)
-                content = re.sub(r'\n{3,}', '\n\n', content)
-                if len(content) > 200:
-                    logger.info(f"✓ Jina AI SUCCESS: {len(content)} caractere")
-                    return content
-                else:
-                    logger.warning(f"Jina AI: conținut prea scurt ({len(content)} char)")
-            else:
-                logger.warning(f"Jina AI HTTP {response.status_code}")
+            # Metoda 1: Trafilatura pe HTML descărcat în flux (limitat ca mărime)
+            with trace_span("fetch.trafilatura"):
+                downloaded, final_url = download_text(url)
+                if downloaded:
+                    # Reține redirect-urile și <link rel=canonical> pentru identitatea canonică
+                    canonical = find_canonical_link(downloaded, final_url)
+                    if not canonical or not url_aliases.accept_declared(final_url, canonical):
+                        canonical = final_url
+                    if url_key(canonical) != url_key(url):
+                        url_aliases.record(url, canonical)
+                    content = extract_article_text(downloaded, final_url)
+                    if content and len(content) > 100:
+                        fetch_span["attributes"]["fetch.method"] = "trafilatura"
+                        return content
+            
+            # Metoda 2: Fallback Jina AI - pentru ORICE site care eșuează
+            remaining = remaining_time()
+            if remaining is not None and remaining <= 0:
+                fetch_span["attributes"]["fetch.method"] = "deadline"
+                return None
+            logger.info(f"Trafilatura eșuat, încerc Jina AI pentru: {url[:60]}")
+            with trace_span("fetch.jina"):
+                try:
+                    jina_url = f"https://r.jina.ai/{url}"
+                    content, _ = download_text(jina_url, allowed_types=JINA_CONTENT_TYPES)
+                    if content:
+                        # Curăță markdown headers și formatare excesivă
+                        content = re.sub(r'^#+\s+', '', content, flags=re.MULTILINE)
+                        content = re.sub(r'\n{3,}', '\n\n', content)
+                        if len(content) > 200:
+                            logger.info(f"✓ Jina AI SUCCESS: {len(content)} caractere")
+                            fetch_span["attributes"]["fetch.method"] = "jina"
+                            return content
+                        else:
+                            logger.warning(f"Jina AI: conținut prea scurt ({len(content)} char)")
+                except DownloadRejected as e:
+                    logger.warning(f"Jina AI respins: {e}")
+                except Exception as e:
+                    logger.warning(f"Jina AI eșuat: {type(e).__name__}: {str(e)[:50]}")
+        
+        except DownloadRejected as e:
+            fetch_span["attributes"]["fetch.rejected"] = str(e)
+            logger.info(f"Nu e articol ({e}): {url[:60]}")
         except Exception as e:
-            logger.warning(f"Jina AI eșuat: {type(e).__name__}: {str(e)[:50]}")
+            logger.error(f"Eroare extragere: {e}")
         
-    except Exception as e:
-        logger.error(f"Eroare extragere: {e}")
+        fetch_span["attributes"]["fetch.method"] = "failed"
+        return None
+
+
+class ArticlePrefetcher:
+    """Descarcă și extrage articolele în fundal, înainte să fie cerute.
     
-    return None
+    Rezultatele (sau task-urile încă în curs) stau într-un depozit limitat
+    ca număr de intrări și ca durată de viață. Limitele pe mesaj, pe chat și
+    de concurență împiedică listele uriașe de linkuri sau spam-ul să consume
+    toată lățimea de bandă.
+    """
+    
+    def __init__(self):
+        self.entries = OrderedDict()  # url_key(URL canonic) -> (momentul creării, task, update_id-ul care l-a creat)
+        self.chat_history = {}  # chat_id -> momentele prefetch-urilor din ultimul minut
+        self.semaphore = None
+        self.stats = {"hits": 0, "misses": 0, "prefetched": 0, "skipped": 0}
+    
+    async def _fetch(self, url: str) -> str | None:
+        if self.semaphore is None:
+            self.semaphore = asyncio.Semaphore(PREFETCH_CONCURRENCY)
+        async with self.semaphore:
+            return await asyncio.to_thread(fetch_article_content, url)
+    
+    def _evict(self):
+        now = time.monotonic()
+        while self.entries:
+            url, (created, task, _) = next(iter(self.entries.items()))
+            if len(self.entries) <= PREFETCH_MAX_ENTRIES and now - created <= PREFETCH_TTL:
+                break
+            self.entries.popitem(last=False)
+            task.cancel()
+    
+    def _store(self, key: str, url: str) -> asyncio.Task:
+        task = asyncio.create_task(self._fetch(url))
+        self.entries[key] = (time.monotonic(), task, current_update_id.get())
+        self._evict()
+        return task
+    
+    def _chat_allows(self, chat_id) -> bool:
+        now = time.monotonic()
+        # Curățăm toate chat-urile, altfel fiecare chat văzut vreodată rămâne în dicționar
+        for known_chat in list(self.chat_history):
+            recent = [t for t in self.chat_history[known_chat] if now - t < 60]
+            if recent:
+                self.chat_history[known_chat] = recent
+            else:
+                del self.chat_history[known_chat]
+        history = self.chat_history.get(chat_id, [])
+        if len(history) >= PREFETCH_MAX_PER_CHAT_MINUTE:
+            return False
+        self.chat_history[chat_id] = history + [now]
+        return True
+    
+    def prefetch(self, urls: list, chat_id=None):
+        """Programează descărcarea URL-urilor (fără să aștepte)."""
+        self._evict()
+        for i, url in enumerate(urls):
+            key = url_key(url_aliases.resolve(url))
+            if key in self.entries:
+                continue
+            if i >= PREFETCH_MAX_PER_MESSAGE or not self._chat_allows(chat_id):
+                self.stats["skipped"] += 1
+                continue
+            self.stats["prefetched"] += 1
+            self._store(key, clean_url(url))
+    
+    async def get(self, url: str) -> str | None:
+        """Conținutul articolului - din prefetch dacă există, altfel îl descarcă acum."""
+        self._evict()
+        # Identitatea vine din indexul de aliasuri, dar se descarcă URL-ul primit
+        key = url_key(url_aliases.resolve(url))
+        entry = self.entries.get(key)
+        if entry:
+            _, task, origin = entry
+            # E hit doar dacă prefetch-ul a câștigat timp real: pornit de un update
+            # anterior sau deja terminat. Prefetch-ul din același update, încă în
+            # curs, e doar cererea curentă pornită cu câteva milisecunde mai devreme.
+            if task.done() or origin != current_update_id.get():
+                self.stats["hits"] += 1
+            else:
+                self.stats["misses"] += 1
+        else:
+            self.stats["misses"] += 1
+            task = self._store(key, clean_url(url))
+        try:
+            content = await asyncio.shield(task)
+        except asyncio.CancelledError:
+            if task.cancelled():
+                # Evacuat din depozit între timp - descarcă direct
+                return await asyncio.to_thread(fetch_article_content, clean_url(url))
+            raise
+        if not content and self.entries.get(key, (None, None, None))[1] is task:
+            # Nu păstrăm eșecurile - următoarea cerere reîncearcă
+            del self.entries[key]
+        return content
+    
+    def hit_rate(self) -> float:
+        total = self.stats["hits"] + self.stats["misses"]
+        return self.stats["hits"] / total if total else 0.0
 
 
-def generate_summary(content: str, url: str = None, length_type: str = "lung") -> tuple:
-    """Generează rezumat. Returnează (rezumat, eroare)."""
+prefetcher = ArticlePrefetcher()
+
+
+def build_summary_params(content: str, url: str = None, length_type: str = "lung") -> dict:
+    """Parametrii cererii către Claude - comuni pentru apelul direct și pentru Message Batches."""
+    prompt_template = get_prompt(length_type, has_url=bool(url))
+    prompt = prompt_template.format(content=content[:SUMMARY_INPUT_CHARS])
+    return {
+        "model": SUMMARY_MODEL,
+        "max_tokens": 1500,
+        "messages": [{"role": "user", "content": prompt}],
+    }
+
+
+def generate_raw_summary(content: str, url: str = None, length_type: str = "lung") -> tuple:
+    """Cere rezumatul de la Claude, fără formatare HTML. Returnează (rezumat, eroare)."""
     try:
-        prompt_template = get_prompt(length_type, has_url=bool(url))
-        prompt = prompt_template.format(content=content[:15000])
-        
-        message = client.messages.create(
-            model="claude-sonnet-4-20250514",
-            max_tokens=1500,
-            messages=[{"role": "user", "content": prompt}]
-        )
-        
-        raw_summary = message.content[0].text
-        formatted = format_summary_html(raw_summary, url)
-        return formatted, None
+        params = build_summary_params(content, url, length_type)
+        llm = client
+        remaining = remaining_time()
+        if remaining is not None:
+            if remaining <= 0:
+                return None, "Timp expirat"
+            # Timeout-ul SDK-ului e per încercare: împărțim timpul rămas între încercări
+            # și renunțăm la reîncercări când nu mai ajunge pentru încă una întreagă
+            retries = max(0, min(client.max_retries, int(remaining // LLM_MIN_ATTEMPT_SECONDS) - 1))
+            llm = client.with_options(max_retries=retries, timeout=remaining / (retries + 1))
+        with trace_span("llm.summary", **{"llm.model": params["model"], "summary.length_type": length_type}) as span:
+            raw_response = llm.messages.with_raw_response.create(**params)
+            message = raw_response.parse()
+            span["attributes"].update({
+                "llm.input_tokens": message.usage.input_tokens,
+                "llm.output_tokens": message.usage.output_tokens,
+                "llm.retries": raw_response.retries_taken,
+                "llm.stop_reason": message.stop_reason,
+            })
+        return message.content[0].text, None
         
     except anthropic.AuthenticationError:
         return None, "Cheie API invalidă"
@@ -274,6 +1151,138 @@ def generate_summary(content: str, url: str = None, length_type: str = "lung") -
         return None, f"{type(e).__name__}: {str(e)[:100]}"
 
 
+def generate_summary(content: str, url: str = None, length_type: str = "lung") -> tuple:
+    """Generează rezumat. Returnează (rezumat, eroare)."""
+    raw_summary, error = generate_raw_summary(content, url, length_type)
+    if not raw_summary:
+        return None, error
+    return format_summary_html(raw_summary, url), None
+
+
+def simhash(text: str) -> int | None:
+    """Amprentă SimHash pe 64 de biți din shingle-uri de 3 cuvinte.
+
+    Folosește doar primele SUMMARY_INPUT_CHARS caractere - exact ce vede LLM-ul.
+    Returnează None pentru texte prea scurte ca amprenta să fie relevantă.
+    """
+    words = re.findall(r'\w+', text[:SUMMARY_INPUT_CHARS].lower())
+    if len(words) < DUPLICATE_MIN_WORDS:
+        return None
+    
+    weights = [0] * 64
+    for i in range(len(words) - 2):
+        shingle = ' '.join(words[i:i + 3]).encode('utf-8')
+        h = int.from_bytes(hashlib.blake2b(shingle, digest_size=8).digest(), 'big')
+        for bit in range(64):
+            weights[bit] += 1 if h >> bit & 1 else -1
+    
+    fingerprint = 0
+    for bit in range(64):
+        if weights[bit] > 0:
+            fingerprint |= 1 << bit
+    return fingerprint
+
+
+def is_near_duplicate(a: int | None, b: int | None) -> bool:
+    """Două amprente sunt aproape identice dacă diferă prin cel mult DUPLICATE_MAX_DISTANCE biți."""
+    if a is None or b is None or DUPLICATE_MAX_DISTANCE < 0:
+        return False
+    return bin(a ^ b).count('1') <= DUPLICATE_MAX_DISTANCE
+
+
+class BatchSeen:
+    """Amprentele articolelor deja procesate într-un batch și ce articol le-a adus primul.
+    
+    Un duplicat e comasat doar dacă articolul păstrat primește rezumat; altfel
+    duplicatul e rezumat el însuși, ca știrea să nu dispară din batch.
+    """
+    
+    def __init__(self):
+        self.originals = []  # (amprentă, id-ul articolului original)
+        self.duplicate_of = {}  # id duplicat -> id original
+        self.outcomes = {}  # id original -> Future cu True dacă a primit rezumat
+    
+    def claim(self, fingerprint: int | None, item_id: str) -> str | None:
+        """Înregistrează amprenta articolului. Dacă e aproape identic cu unul văzut, întoarce id-ul aceluia."""
+        for seen, original_id in self.originals:
+            if is_near_duplicate(fingerprint, seen):
+                self.duplicate_of[item_id] = original_id
+                return original_id
+        if fingerprint is not None:
+            self.originals.append((fingerprint, item_id))
+        return None
+    
+    def _outcome(self, item_id: str) -> asyncio.Future:
+        if item_id not in self.outcomes:
+            self.outcomes[item_id] = asyncio.get_running_loop().create_future()
+        return self.outcomes[item_id]
+    
+    def finish(self, item_id: str, success: bool):
+        """Anunță rezultatul unui articol, pentru duplicatele care îl așteaptă."""
+        outcome = self._outcome(item_id)
+        if not outcome.done():
+            outcome.set_result(success)
+    
+    async def original_succeeded(self, item_id: str) -> bool:
+        """Așteaptă articolul păstrat în locul duplicatului item_id; True dacă a primit rezumat."""
+        return await asyncio.shield(self._outcome(self.duplicate_of[item_id]))
+    
+    def release(self, item_id: str):
+        """Duplicatul devine articol de sine stătător (originalul a eșuat)."""
+        self.duplicate_of.pop(item_id, None)
+
+
+class SummaryIndex:
+    """Index în memorie, limitat (LRU), cu rezumatele recente pe amprenta conținutului."""
+    
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self.entries = OrderedDict()  # amprentă -> {cheie lungime: rezumat brut}
+        self.lock = threading.Lock()
+    
+    def lookup(self, fingerprint: int | None, key: str) -> str | None:
+        with self.lock:
+            for known, summaries in reversed(self.entries.items()):
+                if key in summaries and is_near_duplicate(fingerprint, known):
+                    self.entries.move_to_end(known)
+                    return summaries[key]
+        return None
+    
+    def add(self, fingerprint: int | None, key: str, raw_summary: str):
+        if fingerprint is None or self.max_size <= 0:
+            return
+        with self.lock:
+            self.entries.setdefault(fingerprint, {})[key] = raw_summary
+            self.entries.move_to_end(fingerprint)
+            while len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+
+
+summary_index = SummaryIndex(SUMMARY_INDEX_SIZE)
+DEDUP_STATS = {"batch_duplicates": 0, "index_hits": 0, "llm_calls_saved": 0}
+
+
+def summarize_with_index(content: str, url: str = None, length_type: str = "lung", fingerprint: int | None = None) -> tuple:
+    """Ca generate_summary, dar refolosește rezumatul unei știri aproape identice deja procesate."""
+    if fingerprint is None:
+        fingerprint = simhash(content)
+    key = f"{length_type}:{bool(url)}"
+    
+    cached = summary_index.lookup(fingerprint, key)
+    set_span_attributes(**{"summary.index_hit": bool(cached)})
+    if cached:
+        DEDUP_STATS["index_hits"] += 1
+        DEDUP_STATS["llm_calls_saved"] += 1
+        logger.info(f"♻️ Rezumat refolosit pentru conținut aproape identic: {(url or '')[:60]}")
+        return format_summary_html(cached, url), None
+    
+    raw_summary, error = generate_raw_summary(content, url, length_type)
+    if not raw_summary:
+        return None, error
+    summary_index.add(fingerprint, key, raw_summary)
+    return format_summary_html(raw_summary, url), None
+
+
 async def start_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Handler pentru /start."""
     welcome = (
@@ -283,21 +1292,138 @@ async def start_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
         "• <code>/mediu link</code> → 500-600 caractere\n"
         "• <code>/lung link</code> → 850-950 caractere\n"
         "• Link fără comandă → lung (default)\n\n"
-        "📦 <b>Batch:</b> Trimite până la 7 linkuri (pe linii separate) → rezumate scurte\n\n"
+        "📦 <b>Batch:</b> Trimite până la 7 linkuri (pe linii separate) → rezumate scurte\n"
+        "🌙 <b>Digest:</b> <code>/digest linkuri</code> → rezumate scurte, livrate mai târziu, la preț redus\n"
+        "⏹️ <code>/stop</code> → oprește procesarea în curs\n\n"
         "🚀 Trimite primul link!"
     )
     await update.message.reply_text(welcome, parse_mode=ParseMode.HTML)
 
 
-async def process_single_article(url: str, length_type: str, fallback_text: str = None) -> str:
+async def prefetch_links(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Pornește descărcarea linkurilor din orice mesaj, înainte de handler-ele propriu-zise."""
+    message = update.effective_message
+    if not message:
+        return
+    article_urls = filter_article_urls(extract_urls_from_entities(message))
+    if article_urls:
+        prefetcher.prefetch(article_urls, chat_id=update.effective_chat.id if update.effective_chat else None)
+
+
+async def stop_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Handler pentru /stop - anulează procesarea în curs din chat."""
+    chat_id = update.effective_chat.id
+    stopped = 0
+    
+    pending = pending_links.pop(chat_id, None)
+    if pending:
+        # Linkuri încă în fereastra de comasare - nu au pornit
+        pending["task"].cancel()
+        stopped += len(pending["urls"])
+        await pending["processing_msg"].edit_text("⏹️ Oprit.")
+    
+    for task in list(chat_tasks.get(chat_id, ())):
+        if task is not asyncio.current_task() and task.cancel():
+            stopped += 1
+    
+    if stopped:
+        await update.message.reply_text(f"⏹️ Am oprit {stopped} procesări în curs.")
+    else:
+        await update.message.reply_text("Nu e nimic în curs de procesare.")
+
+
+async def stats_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Handler pentru /stats - statistici de economisire."""
+    text = (
+        "📊 <b>Statistici</b>\n\n"
+        f"• Duplicate comasate în batch: {DEDUP_STATS['batch_duplicates']}\n"
+        f"• Rezumate refolosite din index: {DEDUP_STATS['index_hits']}\n"
+        f"• Apeluri LLM economisite: {DEDUP_STATS['llm_calls_saved']}\n"
+        f"• Prefetch: {prefetcher.stats['hits']} hit / {prefetcher.stats['misses']} miss "
+        f"({prefetcher.hit_rate():.0%}), {prefetcher.stats['skipped']} linkuri sărite"
+    )
+    await update.message.reply_text(text, parse_mode=ParseMode.HTML)
+
+
+async def process_single_article(url: str, length_type: str, fallback_text: str = None,
+                                 batch_seen: BatchSeen = None, item_id: str = None) -> str | None:
+    """Procesează un articol într-un span propriu - vezi _process_single_article."""
+    with trace_span("article.process", **{"article.url": url[:200], "summary.length_type": length_type}) as span:
+        summary = await _process_single_article(url, length_type, fallback_text, batch_seen, item_id)
+        span["attributes"]["article.outcome"] = "duplicate" if summary is None else "error" if summary.startswith(FAILURE_MARKERS) else "ok"
+        return summary
+
+
+# Task-urile în curs per chat - /stop le anulează
+chat_tasks = {}
+
+
+def register_chat_task(task: asyncio.Task, chat_id=None):
+    """Înregistrează un task pentru chat-ul curent, ca /stop să-l poată anula."""
+    chat_id = chat_id if chat_id is not None else current_chat_id.get()
+    if chat_id is None:
+        return
+    tasks = chat_tasks.setdefault(chat_id, set())
+    tasks.add(task)
+    
+    def unregister(finished):
+        tasks.discard(finished)
+        if not tasks and chat_tasks.get(chat_id) is tasks:
+            del chat_tasks[chat_id]
+    
+    task.add_done_callback(unregister)
+
+
+async def run_registered(work, label: str) -> str | None:
+    """Rulează work() cu termenul limită al update-ului și oprire prin /stop.
+    
+    Rulează ca task separat, înregistrat pe chat; la expirarea termenului sau
+    la /stop întoarce un marcaj (⏱️ / ⏹️) urmat de label, în loc de rezultat.
+    """
+    async def guarded():
+        try:
+            async with asyncio.timeout(remaining_time()):
+                return await work()
+        except TimeoutError:
+            logger.warning(f"⏱️ Termen limită depășit: {label}")
+            return f"⏱️ Timp expirat: {label}"
+    
+    task = asyncio.create_task(guarded())
+    register_chat_task(task)
+    try:
+        return await task
+    except asyncio.CancelledError:
+        if task.cancelled() and not asyncio.current_task().cancelling():
+            logger.info(f"⏹️ Oprit prin /stop: {label}")
+            return f"⏹️ Oprit: {label}"
+        raise
+
+
+async def run_article(url: str, length_type: str, semaphore: asyncio.Semaphore = None, **kwargs) -> str | None:
+    """process_single_article prin run_registered; locul din semafor e eliberat imediat la ⏱️ / ⏹️."""
+    async def work():
+        if semaphore is None:
+            return await process_single_article(url, length_type, **kwargs)
+        async with semaphore:
+            return await process_single_article(url, length_type, **kwargs)
+    
+    return await run_registered(work, f"{url[:50]}...")
+
+
+async def _process_single_article(url: str, length_type: str, fallback_text: str = None,
+                                  batch_seen: BatchSeen = None, item_id: str = None) -> str | None:
     """Procesează un singur articol și returnează rezumatul.
     
     Args:
         url: URL-ul articolului
         length_type: Tipul de lungime (scurt/mediu/lung)
         fallback_text: Text de rezervă dacă nu poate accesa URL-ul
+        batch_seen: Amprentele articolelor deja procesate în batch-ul curent;
+            dacă articolul e aproape identic cu unul dintre ele și acela primește
+            rezumat, întoarce None
+        item_id: Identitatea articolului în batch_seen (implicit URL-ul)
     """
-    content = fetch_article_content(url)
+    content = await prefetcher.get(url)
     
     # Dacă nu poate accesa link-ul dar are text fallback, folosește textul
     if not content and fallback_text:
@@ -305,7 +1431,7 @@ async def process_single_article(url: str, length_type: str, fallback_text: str
         cleaned_text = clean_telegram_footer(fallback_text)
         
         if len(cleaned_text) >= 50:
-            summary, error = generate_summary(cleaned_text, url=url, length_type=length_type)
+            summary, error = await asyncio.to_thread(summarize_with_index, cleaned_text, url, length_type)
             if summary:
                 return summary
             else:
@@ -319,12 +1445,25 @@ async def process_single_article(url: str, length_type: str, fallback_text: str
     if not content:
         return f"❌ Nu am putut extrage: {url[:50]}..."
     
-    # Are content de la URL, generează sumar normal
-    summary, error = generate_summary(content, url, length_type)
-    if not summary:
-        return f"❌ Eroare pentru {url[:50]}...: {error}"
+    fingerprint = await asyncio.to_thread(simhash, content)
+    item_id = item_id or url
+    if batch_seen is not None and batch_seen.claim(fingerprint, item_id):
+        if await batch_seen.original_succeeded(item_id):
+            DEDUP_STATS["batch_duplicates"] += 1
+            DEDUP_STATS["llm_calls_saved"] += 1
+            logger.info(f"♻️ Duplicat în batch, îl comasez: {url[:60]}")
+            return None
+        logger.info(f"♻️ Articolul păstrat a eșuat, rezum duplicatul: {url[:60]}")
+        batch_seen.release(item_id)
     
-    return summary
+    # Are content de la URL, generează sumar normal
+    summary = None
+    try:
+        summary, error = await asyncio.to_thread(summarize_with_index, content, url, length_type, fingerprint)
+    finally:
+        # Și la eroare sau /stop - duplicatele nu trebuie să aștepte la nesfârșit
+        if batch_seen is not None:
+            batch_seen.finish(item_id, bool(summary))
     if not summary:
         return f"❌ Eroare pentru {url[:50]}...: {error}"
     
@@ -578,10 +1717,14 @@ def get_relevant_emoji(text: str) -> list:
     return relevant_emojis
 
 
-def ensure_emoji_in_summaries(summaries: list) -> list:
-    """Asigură că fiecare rezumat are emoji UNIC și RELEVANT la început."""
+def ensure_emoji_in_summaries(summaries: list, used_emojis: set = None) -> list:
+    """Asigură că fiecare rezumat are emoji UNIC și RELEVANT la început.
+    
+    used_emojis: emoji-urile deja folosite în rezumatele livrate anterior
+    (actualizat pe loc), pentru deduplicare incrementală.
+    """
     fixed_summaries = []
-    used_emojis = set()  # Track emoji-uri deja folosite
+    used_emojis = set() if used_emojis is None else used_emojis  # Track emoji-uri deja folosite
     
     # Lista completă de emoji-uri disponibile ca fallback
     all_emojis = ['🏛️', '🇲🇩', '🇷🇴', '🇺🇦', '🇵🇱', '🇹🇷', '🇪🇺', '🇷🇺', '🇺🇸', '🇨🇦',
@@ -593,8 +1736,8 @@ def ensure_emoji_in_summaries(summaries: list) -> list:
                   '📰', '🚀', '✨', '📊', '🎯', '⚠️']
     
     for idx, summary in enumerate(summaries):
-        # Skip mesaje de eroare
-        if summary.startswith('❌'):
+        # Skip mesaje de eroare / timp expirat / oprite
+        if summary.startswith(FAILURE_MARKERS):
             fixed_summaries.append(summary)
             continue
         
@@ -720,13 +1863,53 @@ def categorize_summaries_moldova_externe(summaries: list) -> tuple:
     return moldova_summaries, externe_summaries
 
 
+def build_batch_text(summaries: list) -> str:
+    """Asamblează rezumatele unui batch: emoji-uri unice și, de la 4 știri, Moldova first, Externe last."""
+    # Asigură că toate rezumatele au emoji-uri UNICE (fără duplicate)
+    summaries = ensure_emoji_in_summaries(summaries)
+    
+    # Dacă sunt 4+ știri, sortează: Moldova first, Externe last
+    if len(summaries) >= 4:
+        moldova_summaries, externe_summaries = categorize_summaries_moldova_externe(summaries)
+        
+        # Construiește textul final cu separator dacă există ambele categorii
+        if moldova_summaries and externe_summaries:
+            final_text = "\n\n".join(moldova_summaries)
+            final_text += "\n\n::: EXTERNE\n\n"
+            final_text += "\n\n".join(externe_summaries)
+            return final_text
+    
+    # Sub 4 știri sau toate din aceeași categorie, păstrează ordinea originală
+    return "\n\n".join(summaries)
+
+
+def split_message(text: str, limit: int = 4000) -> list:
+    """Împarte un text lung în bucăți sub limita Telegram, la granița dintre paragrafe."""
+    chunks = []
+    current = ""
+    for paragraph in text.split("\n\n"):
+        candidate = f"{current}\n\n{paragraph}" if current else paragraph
+        if len(candidate) <= limit:
+            current = candidate
+            continue
+        if current:
+            chunks.append(current)
+        while len(paragraph) > limit:
+            chunks.append(paragraph[:limit])
+            paragraph = paragraph[limit:]
+        current = paragraph
+    if current:
+        chunks.append(current)
+    return chunks
+
+
 async def handle_length_command(update: Update, context: ContextTypes.DEFAULT_TYPE, length_type: str):
     """Handler comun pentru comenzile /scurt, /mediu, /lung."""
     text = update.message.text or ""
     
     # Extrage linkurile din mesaj (după comandă)
     urls = re.findall(r'https?://[^\s<>"{}|\\^`\[\]]+', text)
-    article_urls = filter_article_urls(urls)
+    article_urls = dedupe_urls(filter_article_urls(urls))
     
     if not article_urls:
         await update.message.reply_text(f"❌ Folosește: /{length_type} https://link-articol.com")
@@ -738,41 +1921,11 @@ async def handle_length_command(update: Update, context: ContextTypes.DEFAULT_TY
     if len(article_urls) == 1:
         # Extrage textul fără comandă pentru a-l folosi ca fallback
         text_without_command = re.sub(r'^/\w+\s+', '', text).strip()
-        summary = await process_single_article(article_urls[0], length_type, fallback_text=text_without_command)
+        summary = await run_article(article_urls[0], length_type, fallback_text=text_without_command)
         await processing_msg.edit_text(summary, parse_mode=ParseMode.HTML)
     else:
         # Batch - max 7, folosește tipul specificat
-        urls_to_process = article_urls[:MAX_BATCH_LINKS]
-        summaries = []
-        
-        for i, url in enumerate(urls_to_process):
-            await processing_msg.edit_text(f"⏳ Procesez {i+1}/{len(urls_to_process)}...")
-            summary = await process_single_article(url, length_type)
-            summaries.append(summary)
-        
-        # Asigură că toate rezumatele au emoji-uri UNICE (fără duplicate)
-        summaries = ensure_emoji_in_summaries(summaries)
-        
-        # Dacă sunt 4+ știri, sortează: Moldova first, Externe last
-        if len(urls_to_process) >= 4:
-            moldova_summaries, externe_summaries = categorize_summaries_moldova_externe(summaries)
-            
-            # Construiește textul final cu separator dacă există ambele categorii
-            if moldova_summaries and externe_summaries:
-                final_text = "\n\n".join(moldova_summaries)
-                final_text += "\n\n::: EXTERNE\n\n"
-                final_text += "\n\n".join(externe_summaries)
-            else:
-                # Toate sunt Moldova sau toate sunt externe
-                final_text = "\n\n".join(summaries)
-        else:
-            # Sub 4 știri, păstrează ordinea originală
-            final_text = "\n\n".join(summaries)
-        
-        # Telegram are limită de 4096 caractere
-        if len(final_text) > 4000:
-            final_text = final_text[:4000] + "\n\n⚠️ Textul a fost trunchiat."
-        
+        final_text = await process_batch(article_urls, length_type, processing_msg)
         await processing_msg.edit_text(final_text, parse_mode=ParseMode.HTML)
 
 
@@ -786,6 +1939,179 @@ async def lung_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     await handle_length_command(update, context, "lung")
 
 
+# Referințe la task-urile de fundal în curs (altfel pot fi colectate de GC)
+background_tasks = set()
+
+
+def spawn_background(coro) -> asyncio.Task:
+    """Pornește un task de fundal și îl ține în viață până se termină."""
+    task = asyncio.create_task(coro)
+    background_tasks.add(task)
+    task.add_done_callback(background_tasks.discard)
+    return task
+
+
+def submit_digest_batch(requests: list) -> str:
+    """Trimite cererile la Message Batches API. Returnează ID-ul batch-ului."""
+    with trace_span("llm.batch_submit", **{"llm.batch_size": len(requests)}) as span:
+        batch = client.beta.messages.batches.create(requests=requests)
+        span["attributes"]["llm.batch_id"] = batch.id
+    logger.info(f"📨 Digest batch {batch.id}: {len(requests)} cereri")
+    return batch.id
+
+
+def collect_digest_results(batch_id: str) -> dict:
+    """Citește rezultatele unui batch încheiat. Returnează {custom_id: rezumat brut} doar pentru cele reușite."""
+    results = {}
+    for entry in client.beta.messages.batches.results(batch_id):
+        if entry.result.type == "succeeded":
+            results[entry.custom_id] = entry.result.message.content[0].text
+        else:
+            logger.warning(f"Digest {batch_id}: {entry.custom_id} → {entry.result.type}")
+    return results
+
+
+def cancel_digest_batch(batch_id: str):
+    """Anulează un batch rămas în lucru, ca să nu plătim rezumate pe care nu le mai așteaptă nimeni."""
+    try:
+        client.beta.messages.batches.cancel(batch_id)
+    except Exception as e:
+        logger.warning(f"Digest {batch_id}: anulare eșuată: {type(e).__name__}: {str(e)[:100]}")
+
+
+async def wait_for_digest_batch(batch_id: str) -> bool:
+    """Așteaptă încheierea batch-ului. Returnează False dacă a depășit DIGEST_MAX_WAIT."""
+    waited = 0.0
+    while waited < DIGEST_MAX_WAIT:
+        batch = await asyncio.to_thread(client.beta.messages.batches.retrieve, batch_id)
+        if batch.processing_status == "ended":
+            return True
+        await asyncio.sleep(DIGEST_POLL_INTERVAL)
+        waited += DIGEST_POLL_INTERVAL
+    return False
+
+
+async def run_digest(bot, chat_id: int, processing_msg, urls: list, length_type: str = "scurt"):
+    """Procesează un digest: extrage articolele, trimite rezumatele prin Message Batches, livrează rezultatul.
+    
+    Articolele pentru care batch-ul eșuează (errored/expired/canceled) sunt
+    reprocesate pe calea sincronă obișnuită.
+    """
+    summaries = [None] * len(urls)
+    pending = {}  # custom_id -> (index, content, url, fingerprint)
+    batch_seen = BatchSeen()
+    duplicate_items = []  # (index, content, url, fingerprint) - comasate doar dacă originalul reușește
+    
+    # Extragerea pornește pentru toate linkurile deodată (prefetcher-ul limitează
+    # concurența); deduplicarea și indexul se aplică apoi în ordinea linkurilor
+    contents = await asyncio.gather(*(prefetcher.get(url) for url in urls))
+    
+    for i, (url, content) in enumerate(zip(urls, contents)):
+        if not content:
+            summaries[i] = f"❌ Nu am putut extrage: {url[:50]}..."
+            continue
+        
+        fingerprint = await asyncio.to_thread(simhash, content)
+        if batch_seen.claim(fingerprint, url):
+            duplicate_items.append((i, content, url, fingerprint))
+            continue
+        
+        cached = summary_index.lookup(fingerprint, f"{length_type}:True")
+        if cached:
+            DEDUP_STATS["index_hits"] += 1
+            DEDUP_STATS["llm_calls_saved"] += 1
+            summaries[i] = format_summary_html(cached, url)
+            continue
+        
+        pending[f"item-{i}"] = (i, content, url, fingerprint)
+    
+    results = {}
+    if pending:
+        requests = [
+            {"custom_id": custom_id, "params": build_summary_params(content, url, length_type)}
+            for custom_id, (_, content, url, _) in pending.items()
+        ]
+        try:
+            batch_id = await asyncio.to_thread(submit_digest_batch, requests)
+            await processing_msg.edit_text(
+                f"📨 Digest trimis la procesare ({len(requests)} articole). Revin când e gata."
+            )
+            try:
+                finished = await wait_for_digest_batch(batch_id)
+            except asyncio.CancelledError:
+                # /stop: batch-ul nu mai are destinatar
+                await asyncio.to_thread(cancel_digest_batch, batch_id)
+                raise
+            if finished:
+                results = await asyncio.to_thread(collect_digest_results, batch_id)
+            else:
+                logger.warning(f"Digest {batch_id}: timp de așteptare depășit, anulez și trec pe calea sincronă")
+                await asyncio.to_thread(cancel_digest_batch, batch_id)
+        except Exception as e:
+            logger.error(f"Message Batches eșuat, trec pe calea sincronă: {type(e).__name__}: {str(e)[:100]}")
+    
+    key = f"{length_type}:True"
+    for custom_id, (i, content, url, fingerprint) in pending.items():
+        raw_summary = results.get(custom_id)
+        if raw_summary:
+            summary_index.add(fingerprint, key, raw_summary)
+            summaries[i] = format_summary_html(raw_summary, url)
+            continue
+        summary, error = await asyncio.to_thread(summarize_with_index, content, url, length_type, fingerprint)
+        summaries[i] = summary or f"❌ Eroare pentru {url[:50]}...: {error}"
+    
+    duplicates = 0
+    for i, content, url, fingerprint in duplicate_items:
+        original = summaries[urls.index(batch_seen.duplicate_of[url])]
+        if original and not original.startswith(FAILURE_MARKERS):
+            DEDUP_STATS["batch_duplicates"] += 1
+            DEDUP_STATS["llm_calls_saved"] += 1
+            duplicates += 1
+            continue
+        # Originalul a eșuat - duplicatul ține locul știrii
+        summary, error = await asyncio.to_thread(summarize_with_index, content, url, length_type, fingerprint)
+        summaries[i] = summary or f"❌ Eroare pentru {url[:50]}...: {error}"
+    
+    final_text = build_batch_text([summary for summary in summaries if summary is not None])
+    if duplicates:
+        final_text += f"\n\nℹ️ Am comasat {duplicates} știri duplicate."
+    
+    chunks = split_message(final_text)
+    await processing_msg.edit_text(chunks[0], parse_mode=ParseMode.HTML)
+    for chunk in chunks[1:]:
+        await bot.send_message(chat_id, chunk, parse_mode=ParseMode.HTML)
+
+
+async def digest_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Handler pentru /digest - rezumate scurte prin Message Batches API (asincron, preț redus)."""
+    text = update.message.text or ""
+    urls = re.findall(r'https?://[^\s<>"{}|\\^`\[\]]+', text)
+    article_urls = dedupe_urls(filter_article_urls(urls))
+    
+    if not article_urls:
+        await update.message.reply_text("❌ Folosește: /digest link1 link2 ...")
+        return
+    
+    urls_to_process = article_urls[:MAX_DIGEST_LINKS]
+    processing_msg = await update.message.reply_text(f"⏳ Pregătesc digestul ({len(urls_to_process)} linkuri)...")
+    if len(article_urls) > MAX_DIGEST_LINKS:
+        await update.message.reply_text(f"⚠️ Procesez doar primele {MAX_DIGEST_LINKS} linkuri.")
+    
+    async def run():
+        # Digestul e offline - nu moștenește termenul limită al update-ului
+        current_deadline.set(None)
+        try:
+            await run_digest(context.bot, update.effective_chat.id, processing_msg, urls_to_process)
+        except asyncio.CancelledError:
+            await processing_msg.edit_text("⏹️ Digest oprit.")
+            raise
+        except Exception as e:
+            logger.error(f"Digest eșuat: {type(e).__name__}: {e}")
+            await processing_msg.edit_text(f"❌ Digest eșuat: {type(e).__name__}")
+    
+    register_chat_task(spawn_background(run()))
+
+
 async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Handler pentru mesaje fără comandă."""
     text = update.message.text or update.message.caption or ""
@@ -805,74 +2131,290 @@ async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE):
             return
         
         processing_msg = await update.message.reply_text("⏳ Procesez textul...")
-        summary, error = generate_summary(cleaned_text, url=None, length_type="lung")
         
-        if not summary:
-            await processing_msg.edit_text(f"❌ Eroare: {error}")
+        async def summarize_text():
+            summary, error = await asyncio.to_thread(generate_summary, cleaned_text, None, "lung")
+            return summary or f"❌ Eroare: {error}"
+        
+        summary = await run_registered(summarize_text, "textul trimis")
+        if summary.startswith(FAILURE_MARKERS):
+            await processing_msg.edit_text(summary)
             return
         
         await processing_msg.edit_text(summary, parse_mode=ParseMode.HTML)
         return
     
-    processing_msg = await update.message.reply_text("⏳ Procesez...")
+    if COALESCE_WINDOW_SECONDS > 0:
+        await coalesce_links(update, article_urls, text)
+        return
     
-    # Un singur link - rezumat LUNG (default)
+    processing_msg = await update.message.reply_text("⏳ Procesez...")
+    await deliver_links(processing_msg, article_urls, fallback_text=text)
+
+
+async def deliver_links(processing_msg, article_urls: list, fallback_text: str = None):
+    """Un singur link → rezumat LUNG (default); mai multe → batch de rezumate SCURTE."""
     if len(article_urls) == 1:
-        summary = await process_single_article(article_urls[0], "lung", fallback_text=text)
+        summary = await run_article(article_urls[0], "lung", fallback_text=fallback_text)
         await processing_msg.edit_text(summary, parse_mode=ParseMode.HTML)
     else:
-        # Batch - max 7, rezumate SCURTE
-        urls_to_process = article_urls[:MAX_BATCH_LINKS]
-        summaries = []
-        
-        for i, url in enumerate(urls_to_process):
-            await processing_msg.edit_text(f"⏳ Procesez {i+1}/{len(urls_to_process)}...")
-            summary = await process_single_article(url, "scurt")
-            summaries.append(summary)
-        
-        # Asigură că toate rezumatele au emoji-uri UNICE (fără duplicate)
-        summaries = ensure_emoji_in_summaries(summaries)
-        
-        # Dacă sunt 4+ știri, sortează: Moldova first, Externe last
-        if len(urls_to_process) >= 4:
-            moldova_summaries, externe_summaries = categorize_summaries_moldova_externe(summaries)
-            
-            # Construiește textul final cu separator dacă există ambele categorii
-            if moldova_summaries and externe_summaries:
-                final_text = "\n\n".join(moldova_summaries)
-                final_text += "\n\n::: EXTERNE\n\n"
-                final_text += "\n\n".join(externe_summaries)
-            else:
-                # Toate sunt Moldova sau toate sunt externe
-                final_text = "\n\n".join(summaries)
-        else:
-            # Sub 4 știri, păstrează ordinea originală
-            final_text = "\n\n".join(summaries)
-        
-        if len(final_text) > 4000:
-            final_text = final_text[:4000] + "\n\n⚠️ Textul a fost trunchiat."
-        
-        if len(article_urls) > MAX_BATCH_LINKS:
-            final_text += f"\n\n⚠️ Am procesat doar primele {MAX_BATCH_LINKS} linkuri."
-        
+        final_text = await process_batch(article_urls, "scurt", processing_msg)
         await processing_msg.edit_text(final_text, parse_mode=ParseMode.HTML)
 
 
+# Linkurile în așteptare per chat (fereastra de comasare)
+pending_links = {}
 
-def main():
+
+async def coalesce_links(update: Update, article_urls: list, text: str):
+    """Adună linkurile din mesajele care sosesc într-o fereastră de COALESCE_WINDOW_SECONDS.
+    
+    Primul mesaj primește mesajul de progres; fiecare mesaj nou prelungește
+    fereastra, dar nu peste COALESCE_MAX_WAIT de la primul.
+    """
+    chat_id = update.effective_chat.id
+    extra_msg = None
+    if chat_id not in pending_links:
+        processing_msg = await update.message.reply_text("⏳ Procesez...")
+        if chat_id in pending_links:
+            # Între timp (await) a sosit alt mesaj din același chat și a deschis fereastra
+            extra_msg = processing_msg
+        else:
+            pending_links[chat_id] = {
+                "urls": [], "fallback_text": text, "processing_msg": processing_msg,
+                "started": time.monotonic(), "task": None,
+            }
+    
+    pending = pending_links[chat_id]
+    if pending["task"]:
+        # Al doilea mesaj - textul forward-at e fallback doar pentru un mesaj cu un singur link
+        pending["fallback_text"] = None
+        pending["task"].cancel()
+    
+    known = {url_key(url) for url in pending["urls"]}
+    pending["urls"].extend(url for url in article_urls if url_key(url) not in known)
+    
+    elapsed = time.monotonic() - pending["started"]
+    delay = max(0.0, min(COALESCE_WINDOW_SECONDS, COALESCE_MAX_WAIT - elapsed))
+    pending["task"] = spawn_background(flush_pending_links(chat_id, delay))
+    
+    if extra_msg:
+        await extra_msg.delete()
+
+
+async def flush_pending_links(chat_id: int, delay: float):
+    """După fereastra de comasare, procesează toate linkurile adunate ca un singur job."""
+    await asyncio.sleep(delay)
+    # Scos din așteptare înainte de primul await - mesajele noi încep o fereastră nouă
+    pending = pending_links.pop(chat_id)
+    urls = pending["urls"]
+    if len(urls) > 1 and pending["fallback_text"] is None:
+        logger.info(f"Chat {chat_id}: {len(urls)} linkuri comasate într-un batch")
+    try:
+        await deliver_links(pending["processing_msg"], urls, fallback_text=pending["fallback_text"])
+    except Exception as e:
+        logger.error(f"Batch comasat eșuat: {type(e).__name__}: {e}")
+        await pending["processing_msg"].edit_text(f"❌ Eroare la procesare: {type(e).__name__}")
+
+
+async def process_batch(article_urls: list, length_type: str, processing_msg) -> str:
+    """Procesează concurent un batch (max MAX_BATCH_LINKS) și întoarce textul final.
+    
+    Rezumatele păstrează ordinea linkurilor; duplicatele sunt comasate, iar
+    mesajul de progres e actualizat pe măsură ce articolele se termină.
+    Articolele care depășesc termenul limită sau sunt oprite prin /stop
+    apar cu marcaj, restul rezultatelor sunt livrate normal.
+    """
+    urls_to_process = article_urls[:MAX_BATCH_LINKS]
+    semaphore = asyncio.Semaphore(BATCH_CONCURRENCY)
+    batch_seen = BatchSeen()
+    completed = 0
+    
+    await processing_msg.edit_text(f"⏳ Procesez 0/{len(urls_to_process)}...")
+    
+    async def process(url: str):
+        nonlocal completed
+        summary = await run_article(url, length_type, semaphore=semaphore, batch_seen=batch_seen)
+        completed += 1
+        try:
+            await processing_msg.edit_text(f"⏳ Procesez {completed}/{len(urls_to_process)}...")
+        except TelegramError:
+            pass  # progresul nu e critic (ex. limită de editări)
+        return summary
+    
+    results = await asyncio.gather(*(process(url) for url in urls_to_process))
+    summaries = [summary for summary in results if summary is not None]
+    duplicates = len(results) - len(summaries)
+    
+    final_text = build_batch_text(summaries)
+    
+    # Telegram are limită de 4096 caractere
+    if len(final_text) > 4000:
+        final_text = final_text[:4000] + "\n\n⚠️ Textul a fost trunchiat."
+    
+    if duplicates:
+        final_text += f"\n\nℹ️ Am comasat {duplicates} știri duplicate."
+    
+    if len(article_urls) > MAX_BATCH_LINKS:
+        final_text += f"\n\n⚠️ Am procesat doar primele {MAX_BATCH_LINKS} linkuri."
+    
+    return final_text
+
+
+def read_batch_items(stream) -> list:
+    """Citește elementele unui job batch: URL-uri (câte unul pe linie) sau texte (blocuri separate prin linie goală)."""
+    items = []
+    seen = set()
+    for block in re.split(r'\n\s*\n', stream.read()):
+        lines = [line.strip() for line in block.strip().splitlines() if line.strip()]
+        if not lines:
+            continue
+        if all(re.match(r'https?://\S+$', line) for line in lines):
+            for url in lines:
+                item_id = f"url:{url_key(url_aliases.resolve(url))}"
+                if item_id not in seen:
+                    seen.add(item_id)
+                    items.append({"id": item_id, "url": clean_url(url)})
+        else:
+            text = "\n".join(lines)
+            item_id = f"text:{hashlib.sha1(text.encode('utf-8')).hexdigest()[:16]}"
+            if item_id not in seen:
+                seen.add(item_id)
+                items.append({"id": item_id, "text": text})
+    return items
+
+
+def load_batch_checkpoint(path: str) -> dict:
+    """Elementele deja terminate dintr-un checkpoint JSONL ({id: înregistrare})."""
+    done = {}
+    try:
+        with open(path, encoding='utf-8') as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                    done[record["id"]] = record
+                except (ValueError, KeyError):
+                    pass  # linie scrisă pe jumătate la o întrerupere
+    except FileNotFoundError:
+        pass
+    return done
+
+
+async def run_batch_job(items: list, length_type: str = "scurt", concurrency: int = 8,
+                        output_format: str = "jsonl", checkpoint_path: str = None, out=sys.stdout) -> int:
+    """Rulează pipeline-ul de rezumare pe o listă de elemente, fără Telegram.
+    
+    Formatul jsonl scrie câte o linie pe măsură ce elementele se termină;
+    html scrie la final textul grupat (emoji unice, Moldova/Externe), ca în bot.
+    Elementele reușite sunt adăugate în checkpoint, iar la o nouă rulare cu
+    același checkpoint sunt sărite. Returnează numărul de erori.
+    """
+    key_prefix = f"{length_type}:"
+    # În checkpoint ID-urile sunt prefixate cu lungimea, ca un job scurt să nu fie refolosit pentru unul lung
+    done = {}
+    for item_id, record in (load_batch_checkpoint(checkpoint_path) if checkpoint_path else {}).items():
+        if item_id.startswith(key_prefix):
+            done[item_id[len(key_prefix):]] = dict(record, id=item_id[len(key_prefix):])
+    pending = [item for item in items if item["id"] not in done]
+    logger.info(f"Batch: {len(items)} elemente, {len(items) - len(pending)} din checkpoint, {len(pending)} de procesat")
+    
+    semaphore = asyncio.Semaphore(concurrency)
+    prefetcher.semaphore = asyncio.Semaphore(concurrency)
+    # Executorul implicit are min(32, CPU + 4) fire - ar plafona --concurrency.
+    # Job-ul deține bucla (asyncio.run din main), deci îi putem da unul propriu.
+    asyncio.get_running_loop().set_default_executor(ThreadPoolExecutor(max_workers=concurrency + 4))
+    batch_seen = BatchSeen()
+    used_emojis = set()
+    
+    def emit(record: dict):
+        if output_format == "jsonl":
+            if record["summary"] and not record["error"]:
+                record["summary"] = ensure_emoji_in_summaries([record["summary"]], used_emojis)[0]
+            out.write(json.dumps(record, ensure_ascii=False) + "\n")
+            out.flush()
+    
+    async def process(item: dict) -> dict:
+        async with semaphore:
+            with trace_span("batch.item", **{"batch.item_id": item["id"]}):
+                if "url" in item:
+                    summary = await process_single_article(item["url"], length_type, batch_seen=batch_seen, item_id=item["id"])
+                else:
+                    summary, error = await asyncio.to_thread(summarize_with_index, item["text"], None, length_type)
+                    summary = summary or f"❌ Eroare: {error}"
+        group = None
+        if summary and not summary.startswith(FAILURE_MARKERS):
+            moldova, _ = categorize_summaries_moldova_externe([summary])
+            group = "moldova" if moldova else "externe"
+        return {
+            "id": item["id"],
+            "url": item.get("url"),
+            "summary": summary,
+            "group": group,
+            "duplicate": summary is None,
+            "duplicate_of": batch_seen.duplicate_of.get(item["id"]),
+            "error": bool(summary and summary.startswith(FAILURE_MARKERS)),
+        }
+    
+    for record in done.values():
+        emit(record)
+    
+    errors = 0
+    checkpoint = open(checkpoint_path, 'a', encoding='utf-8') if checkpoint_path else None
+    try:
+        for finished in asyncio.as_completed([asyncio.create_task(process(item)) for item in pending]):
+            record = await finished
+            done[record["id"]] = record
+            emit(record)
+            if record["error"]:
+                errors += 1
+            elif checkpoint:
+                checkpoint.write(json.dumps(dict(record, id=key_prefix + record["id"]), ensure_ascii=False) + "\n")
+                checkpoint.flush()
+    finally:
+        if checkpoint:
+            checkpoint.close()
+    
+    if output_format == "html":
+        summaries = [done[item["id"]]["summary"] for item in items
+                     if item["id"] in done and not done[item["id"]]["duplicate"]]
+        out.write(build_batch_text(summaries) + "\n")
+        out.flush()
+    
+    finished_count = sum(1 for item in items if item["id"] in done)
+    logger.info(f"Batch terminat: {finished_count}/{len(items)} elemente, {errors} erori, {DEDUP_STATS['llm_calls_saved']} apeluri LLM economisite")
+    return errors
+
+
+def run_bot():
     """Pornește botul."""
     if not TELEGRAM_TOKEN:
         raise ValueError("TELEGRAM_TOKEN nu e setat!")
     if not ANTHROPIC_API_KEY:
         raise ValueError("ANTHROPIC_API_KEY nu e setat!")
     
-    application = Application.builder().token(TELEGRAM_TOKEN).build()
+    application = (
+        Application.builder()
+        .token(TELEGRAM_TOKEN)
+        .application_class(TracedApplication)
+        # Aceleași setări ca cererea construită implicit de builder (256 de conexiuni,
+        # timeout-urile implicite HTTPXRequest); HTTPXRequest() simplu are o singură conexiune
+        # și, cu update-uri concurente, cererile expiră așteptând-o
+        .request(TracedHTTPXRequest(connection_pool_size=256))
+        .concurrent_updates(True)  # /stop trebuie procesat cât timp alte update-uri rulează
+        .build()
+    )
+    
+    # Prefetch - rulează primul (grupul -1) pentru orice mesaj cu linkuri
+    application.add_handler(MessageHandler(filters.ALL, prefetch_links), group=-1)
     
     # Comenzi
     application.add_handler(CommandHandler("start", start_command))
     application.add_handler(CommandHandler("scurt", scurt_command))
     application.add_handler(CommandHandler("mediu", mediu_command))
     application.add_handler(CommandHandler("lung", lung_command))
+    application.add_handler(CommandHandler("digest", digest_command))
+    application.add_handler(CommandHandler("stats", stats_command))
+    application.add_handler(CommandHandler("stop", stop_command))
     
     # Mesaje text
     application.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, handle_message))
@@ -882,5 +2424,49 @@ def main():
     application.run_polling(allowed_updates=Update.ALL_TYPES)
 
 
+def main():
+    """Punct de intrare: fără argumente pornește botul, altfel rulează subcomanda CLI."""
+    parser = argparse.ArgumentParser(description="Bot Telegram pentru rezumate de știri")
+    subparsers = parser.add_subparsers(dest="command")
+    
+    trace_parser = subparsers.add_parser("trace", help="Afișează cascada (waterfall) unui trace")
+    trace_parser.add_argument("trace_id", nargs="?", help="ID-ul trace-ului; fără ID listează trace-urile recente")
+    trace_parser.add_argument("--file", default=TRACE_LOG_PATH, help="Fișierul JSONL cu span-uri")
+    
+    bench_parser = subparsers.add_parser("bench-extract", help="Compară nivelurile de extragere pe un corpus HTML salvat")
+    bench_parser.add_argument("corpus_dir", help="Director cu pagini .html")
+    bench_parser.add_argument("--repeat", type=int, default=3, help="Rulări per nivel (se păstrează cea mai rapidă)")
+    
+    batch_parser = subparsers.add_parser("batch", help="Rezumă o listă de URL-uri/texte fără Telegram")
+    batch_parser.add_argument("input", nargs="?", default="-", help="Fișier cu URL-uri/texte (implicit stdin)")
+    batch_parser.add_argument("--length", choices=list(LENGTH_CONFIG), default="scurt", help="Lungimea rezumatelor")
+    batch_parser.add_argument("--format", choices=["jsonl", "html"], default="jsonl",
+                              help="jsonl: o linie per element, pe măsură ce se termină; html: text grupat la final")
+    batch_parser.add_argument("--concurrency", type=int, default=8, help="Elemente procesate simultan")
+    batch_parser.add_argument("--checkpoint", help="Fișier JSONL cu elementele terminate (pentru reluare)")
+    
+    args = parser.parse_args()
+    
+    if args.command == "trace":
+        spans = read_trace_spans(args.file)
+        print(format_trace_waterfall(args.trace_id, spans) if args.trace_id else format_recent_traces(spans))
+        return
+    if args.command == "bench-extract":
+        print(benchmark_extraction(args.corpus_dir, args.repeat))
+        return
+    if args.command == "batch":
+        if not ANTHROPIC_API_KEY:
+            raise ValueError("ANTHROPIC_API_KEY nu e setat!")
+        if args.input == "-":
+            items = read_batch_items(sys.stdin)
+        else:
+            with open(args.input, encoding='utf-8') as f:
+                items = read_batch_items(f)
+        errors = asyncio.run(run_batch_job(items, args.length, args.concurrency, args.format, args.checkpoint))
+        sys.exit(1 if errors else 0)
+    
+    run_bot()
+
+
 if __name__ == "__main__":
     main()
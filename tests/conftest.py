@@ -0,0 +1,50 @@
+import os
+import random
+import sys
+import tempfile
+
+# bot.py citește configurarea la import - setăm un mediu izolat înainte
+os.environ.setdefault("ANTHROPIC_API_KEY", "test-key")
+os.environ["TRACE_LOG_PATH"] = ""
+os.environ["URL_INDEX_PATH"] = os.path.join(tempfile.mkdtemp(), "url_index.json")
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+WORDS = ["guvern", "buget", "parlament", "primărie", "drum", "școală", "spital", "alegeri",
+         "energie", "gaz", "preț", "investiții", "agricultură", "export", "vamă", "instanță"]
+
+
+def article(seed, words: int = 300) -> str:
+    """Text de articol determinist: aceeași sămânță dă aceeași știre, alta dă o știre diferită."""
+    rng = random.Random(seed)
+    return " ".join(rng.choice(WORDS) + str(rng.randint(0, 999)) for _ in range(words))
+
+
+class FakeMessage:
+    """Mesaj Telegram minimal: reține răspunsurile și editările."""
+
+    def __init__(self, text: str = ""):
+        self.text = text
+        self.caption = None
+        self.entities = []
+        self.caption_entities = []
+        self.replies = []
+        self.edits = []
+
+    async def reply_text(self, text, **kwargs):
+        reply = FakeMessage(text)
+        self.replies.append(reply)
+        return reply
+
+    async def edit_text(self, text, **kwargs):
+        self.edits.append(text)
+
+
+class FakeBot:
+    """Bot Telegram minimal: reține mesajele trimise."""
+
+    def __init__(self):
+        self.sent = []
+
+    async def send_message(self, chat_id, text, **kwargs):
+        self.sent.append(text)
@@ -0,0 +1,68 @@
+"""Teste pentru job-ul batch din linia de comandă (run_batch_job)."""
+
+import asyncio
+import io
+import json
+import threading
+import time
+
+import pytest
+
+import bot
+from conftest import article
+
+
+@pytest.fixture
+def pipeline(monkeypatch):
+    monkeypatch.setattr(bot, "prefetcher", bot.ArticlePrefetcher())
+    monkeypatch.setattr(bot, "summary_index", bot.SummaryIndex(bot.SUMMARY_INDEX_SIZE))
+    # Același articol preluat de două portaluri, plus unul diferit
+    contents = {
+        "https://point.md/a": article("sursa"),
+        "https://newsmaker.md/b": article("sursa"),
+        "https://zdg.md/c": article("altceva"),
+    }
+    monkeypatch.setattr(bot, "fetch_article_content", lambda url: contents.get(url) or article(url))
+    state = {"active": 0, "peak": 0}
+    lock = threading.Lock()
+
+    def fake_summarize(content, url=None, length_type="scurt", fingerprint=None):
+        with lock:
+            state["active"] += 1
+            state["peak"] = max(state["peak"], state["active"])
+        time.sleep(0.2)
+        with lock:
+            state["active"] -= 1
+        return "🏛️ Guvernul a aprobat bugetul", None
+
+    monkeypatch.setattr(bot, "summarize_with_index", fake_summarize)
+    return state
+
+
+def run_job(items, **kwargs):
+    out = io.StringIO()
+    errors = asyncio.run(bot.run_batch_job(items, out=out, **kwargs))
+    return errors, [json.loads(line) for line in out.getvalue().splitlines()]
+
+
+def url_items(urls):
+    return bot.read_batch_items(io.StringIO("\n".join(urls)))
+
+
+def test_jsonl_records_reference_the_original_and_keep_emoji_unique(pipeline):
+    items = url_items(["https://point.md/a", "https://newsmaker.md/b", "https://zdg.md/c"])
+    errors, records = run_job(items, concurrency=1)
+    assert errors == 0
+    by_url = {record["url"]: record for record in records}
+    duplicate = by_url["https://newsmaker.md/b"]
+    assert duplicate["duplicate"] and duplicate["summary"] is None
+    assert duplicate["duplicate_of"] == by_url["https://point.md/a"]["id"]
+    assert by_url["https://zdg.md/c"]["duplicate_of"] is None
+    emojis = [record["summary"].split()[0] for record in records if record["summary"]]
+    assert len(emojis) == 2 and len(set(emojis)) == 2
+
+
+def test_concurrency_is_not_capped_by_default_executor(pipeline):
+    urls = [f"https://point.md/stire-{n}" for n in range(16)]
+    run_job(url_items(urls), concurrency=16)
+    assert pipeline["peak"] >= 12
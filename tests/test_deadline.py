@@ -0,0 +1,75 @@
+"""Teste pentru termenul limită al update-ului: reîncercări LLM limitate și oprire prin /stop."""
+
+import asyncio
+import json
+import threading
+import time
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from types import SimpleNamespace
+
+import anthropic
+import pytest
+
+import bot
+from conftest import FakeMessage
+
+
+class OverloadedHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args):
+        pass
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers["Content-Length"]))
+        self.server.calls += 1
+        body = json.dumps({"type": "error", "error": {"type": "overloaded_error", "message": "Overloaded"}}).encode()
+        self.send_response(529)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("retry-after-ms", "1")
+        self.end_headers()
+        self.wfile.write(body)
+
+
+@pytest.fixture
+def overloaded(monkeypatch):
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), OverloadedHandler)
+    httpd.calls = 0
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    monkeypatch.setattr(bot, "client", anthropic.Anthropic(
+        api_key="test-key", base_url=f"http://127.0.0.1:{httpd.server_address[1]}", max_retries=2))
+    yield httpd
+    httpd.shutdown()
+
+
+@pytest.mark.parametrize("seconds_left, attempts", [(None, 3), (100, 3), (40, 1), (10, 1)])
+def test_retries_fit_the_remaining_time(overloaded, seconds_left, attempts):
+    token = bot.current_deadline.set(None if seconds_left is None else time.monotonic() + seconds_left)
+    try:
+        summary, error = bot.generate_raw_summary("Guvernul a aprobat bugetul. " * 20)
+    finally:
+        bot.current_deadline.reset(token)
+    assert summary is None and "Eroare API" in error
+    assert overloaded.calls == attempts
+
+
+def test_text_only_summary_can_be_stopped(monkeypatch):
+    monkeypatch.setattr(bot, "generate_summary", lambda *args: time.sleep(0.5) or ("📰 Rezumat", None))
+    message = FakeMessage("Guvernul a aprobat bugetul pentru anul viitor, cu cheltuieli mai mari pentru drumuri.")
+    update = SimpleNamespace(message=message, effective_chat=SimpleNamespace(id=7))
+
+    async def scenario():
+        token = bot.current_chat_id.set(7)
+        try:
+            handler = asyncio.create_task(bot.handle_message(update, None))
+            await asyncio.sleep(0.1)
+            assert bot.chat_tasks.get(7)
+            for task in bot.chat_tasks[7]:
+                task.cancel()
+            await handler
+        finally:
+            bot.current_chat_id.reset(token)
+
+    asyncio.run(scenario())
+    assert message.replies[0].edits == ["⏹️ Oprit: textul trimis"]
@@ -0,0 +1,72 @@
+"""Teste pentru detectarea știrilor aproape identice (SimHash)."""
+
+import asyncio
+import threading
+
+import pytest
+
+import bot
+from conftest import article
+
+
+def test_syndicated_copy_is_near_duplicate():
+    original = article(1)
+    copy = "IPN: " + original + " Sursa: Moldpres. Abonează-te la canalul nostru."
+    assert bot.is_near_duplicate(bot.simhash(original), bot.simhash(copy))
+
+
+def test_different_article_is_not_duplicate():
+    assert not bot.is_near_duplicate(bot.simhash(article(1)), bot.simhash(article(2)))
+
+
+def test_short_text_has_no_fingerprint():
+    assert bot.simhash("Prea scurt pentru amprentă.") is None
+
+
+def test_fingerprint_ignores_text_beyond_llm_input():
+    head = article(3, words=3000)[:bot.SUMMARY_INPUT_CHARS]
+    assert bot.simhash(head + " coadă" * 100000) == bot.simhash(head)
+
+
+@pytest.fixture
+def syndicated(monkeypatch):
+    """Trei linkuri cu aceeași știre; primul apel LLM poate fi configurat să eșueze."""
+    monkeypatch.setattr(bot, "prefetcher", bot.ArticlePrefetcher())
+    monkeypatch.setattr(bot, "summary_index", bot.SummaryIndex(bot.SUMMARY_INDEX_SIZE))
+    monkeypatch.setattr(bot, "fetch_article_content", lambda url: article(7))
+    state = {"calls": 0, "fail_first": False}
+    lock = threading.Lock()
+
+    def fake_summarize(content, url=None, length_type="scurt", fingerprint=None):
+        with lock:
+            state["calls"] += 1
+            if state["fail_first"] and state["calls"] == 1:
+                return None, "Eroare API"
+        return f"🏛️ Rezumat pentru {url}", None
+
+    monkeypatch.setattr(bot, "summarize_with_index", fake_summarize)
+    return state
+
+
+def process_all(urls):
+    async def scenario():
+        batch_seen = bot.BatchSeen()
+        return await asyncio.gather(*(bot.process_single_article(url, "scurt", batch_seen=batch_seen) for url in urls))
+    return asyncio.run(scenario())
+
+
+URLS = ["https://point.md/a", "https://newsmaker.md/b", "https://ipn.md/c"]
+
+
+def test_duplicates_are_merged_when_original_succeeds(syndicated):
+    results = process_all(URLS)
+    assert syndicated["calls"] == 1
+    assert sum(result is not None for result in results) == 1
+
+
+def test_duplicates_are_summarized_when_original_fails(syndicated):
+    syndicated["fail_first"] = True
+    results = process_all(URLS)
+    assert None not in results
+    assert sum(result.startswith("❌") for result in results) == 1
+    assert sum(result.startswith("🏛️") for result in results) == 2
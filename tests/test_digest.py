@@ -0,0 +1,192 @@
+"""Teste pentru /digest (run_digest) pe un server local care imită Message Batches API."""
+
+import asyncio
+import json
+import threading
+import time
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+import anthropic
+import pytest
+
+import bot
+from conftest import FakeBot, FakeMessage, article
+
+
+def message(text):
+    return {
+        "id": "msg_test", "type": "message", "role": "assistant", "model": "test-model",
+        "content": [{"type": "text", "text": text}],
+        "stop_reason": "end_turn", "stop_sequence": None,
+        "usage": {"input_tokens": 10, "output_tokens": 5},
+    }
+
+
+class FakeAnthropic:
+    """Starea serverului fals: ce batch-uri s-au trimis și cum trebuie să se încheie."""
+
+    def __init__(self):
+        self.batches = {}
+        self.errored = set()      # custom_id-uri care ies "errored" din batch
+        self.fail_submit = False
+        self.never_ends = False
+        self.sync_calls = 0
+        self.sync_failures = 0    # câte apeluri sincrone eșuează înainte să reușească
+        self.cancelled = []
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args):
+        pass
+
+    @property
+    def state(self):
+        return self.server.state
+
+    def send_json(self, obj, status=200, content_type="application/json"):
+        body = obj if isinstance(obj, bytes) else json.dumps(obj).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def batch(self, batch_id):
+        ended = not self.state.never_ends and batch_id not in self.state.cancelled
+        return {
+            "id": batch_id, "type": "message_batch",
+            "processing_status": "ended" if ended else "in_progress",
+            "request_counts": {"processing": 0, "succeeded": 0, "errored": 0, "canceled": 0, "expired": 0},
+            "created_at": "2024-01-01T00:00:00Z", "expires_at": "2024-01-02T00:00:00Z",
+            "ended_at": None, "archived_at": None, "cancel_initiated_at": None,
+            "results_url": f"http://127.0.0.1:{self.server.server_address[1]}/results/{batch_id}" if ended else None,
+        }
+
+    def do_POST(self):
+        data = json.loads(self.rfile.read(int(self.headers["Content-Length"])) or b"{}")
+        path = self.path.split("?")[0]
+        if path == "/v1/messages/batches":
+            if self.state.fail_submit:
+                self.send_json({"type": "error", "error": {"type": "invalid_request_error", "message": "batches off"}}, 400)
+                return
+            batch_id = f"msgbatch_{len(self.state.batches)}"
+            self.state.batches[batch_id] = data["requests"]
+            self.send_json(self.batch(batch_id))
+        elif path.endswith("/cancel"):
+            batch_id = path.split("/")[-2]
+            self.state.cancelled.append(batch_id)
+            self.send_json(self.batch(batch_id))
+        elif path == "/v1/messages":
+            self.state.sync_calls += 1
+            if self.state.sync_calls <= self.state.sync_failures:
+                self.send_json({"type": "error", "error": {"type": "invalid_request_error", "message": "refuzat"}}, 400)
+                return
+            self.send_json(message("📰 Rezumat sincron"))
+        else:
+            self.send_json({"type": "error", "error": {"type": "not_found_error", "message": path}}, 404)
+
+    def do_GET(self):
+        path = self.path.split("?")[0]
+        if path.startswith("/results/"):
+            lines = []
+            for request in self.state.batches[path.split("/")[-1]]:
+                custom_id = request["custom_id"]
+                if custom_id in self.state.errored:
+                    result = {"type": "errored", "error": {"type": "error", "error": {"type": "api_error", "message": "x"}}}
+                else:
+                    result = {"type": "succeeded", "message": message(f"🏛️ {custom_id} rezumat din batch")}
+                lines.append(json.dumps({"custom_id": custom_id, "result": result}))
+            self.send_json("\n".join(lines).encode(), content_type="application/binary")
+        else:
+            self.send_json(self.batch(path.split("/")[-1]))
+
+
+@pytest.fixture
+def fake(monkeypatch):
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    httpd.state = FakeAnthropic()
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    monkeypatch.setenv("ANTHROPIC_BASE_URL", f"http://127.0.0.1:{httpd.server_address[1]}")
+    monkeypatch.setattr(bot, "client", anthropic.Anthropic(api_key="test-key", max_retries=0))
+    monkeypatch.setattr(bot, "prefetcher", bot.ArticlePrefetcher())
+    monkeypatch.setattr(bot, "summary_index", bot.SummaryIndex(bot.SUMMARY_INDEX_SIZE))
+    monkeypatch.setattr(bot, "fetch_article_content", article)
+    monkeypatch.setattr(bot, "DIGEST_POLL_INTERVAL", 0.05)
+    yield httpd.state
+    httpd.shutdown()
+
+
+URLS = ["https://point.md/ro/a", "https://newsmaker.md/ro/b", "https://zdg.md/c"]
+
+
+def digest(urls=URLS):
+    processing_msg, fake_bot = FakeMessage(), FakeBot()
+    asyncio.run(bot.run_digest(fake_bot, 1, processing_msg, urls))
+    return "\n".join(processing_msg.edits[-1:] + fake_bot.sent)
+
+
+def test_succeeded_items_come_from_batch(fake):
+    text = digest()
+    assert len(fake.batches) == 1
+    assert fake.sync_calls == 0
+    for i in range(len(URLS)):
+        assert f"item-{i} rezumat" in text
+
+
+def test_errored_item_falls_back_to_sync(fake):
+    fake.errored.add("item-1")
+    text = digest()
+    assert fake.sync_calls == 1
+    assert "item-0 rezumat" in text
+    assert "item-1" not in text
+    assert "Rezumat sincron" in text
+
+
+def test_failed_submit_falls_back_to_sync(fake):
+    fake.fail_submit = True
+    text = digest()
+    assert fake.batches == {}
+    assert fake.sync_calls == len(URLS)
+    assert text.count("Rezumat sincron") == len(URLS)
+
+
+def test_expired_wait_cancels_batch(fake, monkeypatch):
+    fake.never_ends = True
+    monkeypatch.setattr(bot, "DIGEST_MAX_WAIT", 0.2)
+    text = digest()
+    assert fake.cancelled == ["msgbatch_0"]
+    assert fake.sync_calls == len(URLS)
+    assert "item-" not in text
+
+
+def test_duplicate_is_summarized_when_original_fails(fake, monkeypatch):
+    monkeypatch.setattr(bot, "fetch_article_content", lambda url: article("aceeași știre" if "zdg" not in url else url))
+    fake.errored.add("item-0")
+    fake.sync_failures = 1
+    text = digest()
+    assert [request["custom_id"] for request in fake.batches["msgbatch_0"]] == ["item-0", "item-2"]
+    assert fake.sync_calls == 2
+    assert "Rezumat sincron" in text
+    assert "comasat" not in text
+
+
+def test_articles_are_extracted_concurrently(fake, monkeypatch):
+    state = {"active": 0, "peak": 0}
+    lock = threading.Lock()
+
+    def slow_fetch(url):
+        with lock:
+            state["active"] += 1
+            state["peak"] = max(state["peak"], state["active"])
+        time.sleep(0.2)
+        with lock:
+            state["active"] -= 1
+        return article(url)
+
+    monkeypatch.setattr(bot, "fetch_article_content", slow_fetch)
+    urls = [f"https://point.md/ro/stire-{n}" for n in range(8)]
+    text = digest(urls)
+    assert state["peak"] == bot.PREFETCH_CONCURRENCY
+    assert all(f"item-{i} rezumat" in text for i in range(len(urls)))
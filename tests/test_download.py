@@ -0,0 +1,104 @@
+"""Teste pentru descărcarea în flux (download_text) pe un server HTTP local."""
+
+import threading
+import time
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+import pytest
+
+import bot
+
+ARTICLE_HTML = (
+    '<html><head><meta charset="utf-8"></head><body><article><p>'
+    + 'Guvernul de la Chișinău a aprobat bugetul. ' * 40
+    + '</p></article></body></html>'
+).encode('utf-8')
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args):
+        pass
+
+    def send_chunked(self, chunks, delay=0.0):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        try:
+            for chunk in chunks:
+                self.wfile.write(b"%x\r\n%s\r\n" % (len(chunk), chunk))
+                self.wfile.flush()
+                time.sleep(delay)
+            self.wfile.write(b"0\r\n\r\n")
+        except OSError:
+            pass  # clientul a abandonat descărcarea
+
+    def do_GET(self):
+        if self.path == "/article":
+            self.send_response(200)
+            self.send_header("Content-Type", "text/html; charset=utf-8")
+            self.send_header("Content-Length", str(len(ARTICLE_HTML)))
+            self.end_headers()
+            self.wfile.write(ARTICLE_HTML)
+        elif self.path == "/binary":
+            body = b"%PDF-1.4" + bytes(range(256)) * 8
+            self.send_response(200)
+            self.send_header("Content-Type", "application/pdf")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        elif self.path == "/huge-declared":
+            self.send_response(200)
+            self.send_header("Content-Type", "text/html")
+            self.send_header("Content-Length", str(50 * 1024 * 1024))
+            self.end_headers()
+        elif self.path == "/huge-chunked":
+            self.send_chunked(b"a" * 65536 for _ in range(64))
+        elif self.path == "/slow":
+            self.send_chunked((b"a" for _ in range(100)), delay=0.3)
+
+
+@pytest.fixture(scope="module")
+def server():
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{httpd.server_address[1]}"
+    httpd.shutdown()
+
+
+def test_article_is_decoded(server):
+    text, final_url = bot.download_text(f"{server}/article")
+    assert "Chișinău" in text
+    assert final_url == f"{server}/article"
+
+
+def test_binary_content_type_is_rejected(server):
+    with pytest.raises(bot.DownloadRejected, match="application/pdf"):
+        bot.download_text(f"{server}/binary")
+
+
+def test_declared_content_length_over_cap_is_rejected(server):
+    with pytest.raises(bot.DownloadRejected, match="Content-Length"):
+        bot.download_text(f"{server}/huge-declared", max_bytes=1024 * 1024)
+
+
+def test_streamed_body_over_cap_is_rejected(server):
+    with pytest.raises(bot.DownloadRejected, match="corp"):
+        bot.download_text(f"{server}/huge-chunked", max_bytes=1024 * 1024)
+
+
+def test_slow_drip_is_abandoned(server, monkeypatch):
+    monkeypatch.setattr(bot, "DOWNLOAD_TIMEOUT", 1.0)
+    started = time.monotonic()
+    assert bot.download_text(f"{server}/slow") == (None, f"{server}/slow")
+    assert time.monotonic() - started < 5
+
+
+def test_non_article_is_not_retried_through_jina(server, monkeypatch):
+    calls = []
+    real_download = bot.download_text
+    monkeypatch.setattr(bot, "download_text", lambda url, **kw: calls.append(url) or real_download(url, **kw))
+    assert bot.fetch_article_content(f"{server}/binary") is None
+    assert calls == [f"{server}/binary"]
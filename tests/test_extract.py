@@ -0,0 +1,45 @@
+"""Teste pentru extragerea pe niveluri, pe corpusul din bench/corpus."""
+
+from pathlib import Path
+
+import pytest
+
+import bot
+
+CORPUS = Path(__file__).resolve().parent.parent / "bench" / "corpus"
+
+
+def read(name):
+    return (CORPUS / name).read_text(encoding="utf-8")
+
+
+@pytest.mark.parametrize("tier", ["fast", "full"])
+def test_trafilatura_tiers_measure_link_density(tier):
+    text, link_density = bot.run_extraction_tier(tier, read("point.md_transport-public.html"), "point.md")
+    assert "troleibuz" in text
+    assert "](" not in text  # linkurile sunt numărate, nu păstrate în text
+    assert 0 < link_density < 0.3
+    assert bot.extraction_quality_ok(text, link_density)
+
+
+def test_link_heavy_fast_extraction_is_rejected():
+    links = " ".join(f'<a href="/stiri/{n}">Citește și știrea numărul {n} despre bugetul de stat</a>' for n in range(8))
+    html = "<html><body><article>" + f"<p>Guvernul a aprobat bugetul pentru anul viitor. {links}</p>" * 6 + "</article></body></html>"
+    text, link_density = bot.run_extraction_tier("fast", html, "site.md")
+    assert link_density > 0.3
+    assert not bot.extraction_quality_ok(text, link_density)
+
+
+def test_listing_page_escalates_to_full(monkeypatch):
+    monkeypatch.setattr(bot, "extraction_profiles", bot.ExtractionProfiles(10))
+    tiers = []
+    real_tier = bot.run_extraction_tier
+    monkeypatch.setattr(bot, "run_extraction_tier", lambda tier, *args: tiers.append(tier) or real_tier(tier, *args))
+    bot.extract_article_text(read("newsmaker.md_politic.html"), "https://newsmaker.md/ro/politic")
+    assert tiers[-1] == "full"
+
+
+def test_benchmark_runs_on_corpus():
+    report = bot.benchmark_extraction(str(CORPUS), repeat=1)
+    for path in CORPUS.glob("*.html"):
+        assert path.name[:32] in report
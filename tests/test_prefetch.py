@@ -0,0 +1,71 @@
+"""Teste pentru ArticlePrefetcher: statistici de hit oneste și curățarea istoricului pe chat."""
+
+import asyncio
+import time
+
+import pytest
+
+import bot
+
+
+@pytest.fixture
+def prefetcher(monkeypatch):
+    def slow_fetch(url):
+        time.sleep(0.1)
+        return f"conținut pentru {url}"
+    monkeypatch.setattr(bot, "fetch_article_content", slow_fetch)
+    return bot.ArticlePrefetcher()
+
+
+async def in_update(update_id, coro):
+    token = bot.current_update_id.set(update_id)
+    try:
+        return await coro
+    finally:
+        bot.current_update_id.reset(token)
+
+
+def test_prefetch_from_same_update_is_not_a_hit(prefetcher):
+    async def scenario():
+        async def handle():
+            prefetcher.prefetch(["https://point.md/a"], chat_id=1)
+            return await prefetcher.get("https://point.md/a")
+        return await in_update(1, handle())
+
+    assert asyncio.run(scenario()) == "conținut pentru https://point.md/a"
+    assert prefetcher.stats["hits"] == 0
+    assert prefetcher.stats["misses"] == 1
+
+
+def test_prefetch_from_earlier_update_is_a_hit(prefetcher):
+    async def scenario():
+        async def forward():
+            prefetcher.prefetch(["https://point.md/b"], chat_id=1)
+        await in_update(1, forward())
+        return await in_update(2, prefetcher.get("https://point.md/b"))
+
+    assert asyncio.run(scenario()) == "conținut pentru https://point.md/b"
+    assert prefetcher.stats["hits"] == 1
+    assert prefetcher.stats["misses"] == 0
+
+
+def test_finished_prefetch_is_a_hit_even_in_same_update(prefetcher):
+    async def scenario():
+        async def handle():
+            prefetcher.prefetch(["https://point.md/c"], chat_id=1)
+            await asyncio.sleep(0.3)
+            return await prefetcher.get("https://point.md/c")
+        return await in_update(1, handle())
+
+    asyncio.run(scenario())
+    assert prefetcher.stats["hits"] == 1
+
+
+def test_idle_chats_are_forgotten(prefetcher, monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(bot.time, "monotonic", lambda: now[0])
+    for chat_id in range(50):
+        assert prefetcher._chat_allows(chat_id)
+    now[0] += 61
+    assert prefetcher._chat_allows(99)
+    assert list(prefetcher.chat_history) == [99]
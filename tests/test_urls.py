@@ -0,0 +1,102 @@
+"""Teste pentru normalizarea URL-urilor (clean_url, url_key, dedupe_urls)."""
+
+import asyncio
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+import pytest
+
+import bot
+
+
+@pytest.mark.parametrize("url, expected", [
+    ("https://site.md/?12345", "https://site.md/?12345"),
+    ("https://site.md/cauta?q=a%20b", "https://site.md/cauta?q=a%20b"),
+    ("https://site.md/cauta?q=a+b&utm_source=tg&fbclid=xyz", "https://site.md/cauta?q=a+b"),
+    ("https://site.md/a?x=2&x=1&UTM_Medium=social#comentarii", "https://site.md/a?x=2&x=1"),
+    ("https://site.md/a?utm%5Fsource=tg&id=7", "https://site.md/a?id=7"),
+    ("https://WWW.Site.MD:443//stiri//a", "https://www.site.md/stiri/a"),
+])
+def test_clean_url_keeps_non_tracking_query_untouched(url, expected):
+    assert bot.clean_url(url) == expected
+
+
+@pytest.mark.parametrize("url", ["http://a:b/", "http://example.com:99999/x"])
+def test_malformed_port_does_not_raise(url):
+    assert bot.clean_url(url) == url
+    assert bot.url_key(url)
+    assert bot.dedupe_urls([url, url]) == [url]
+    assert bot.filter_article_urls([url, "https://point.md/a"]) == ["https://point.md/a"]
+
+
+def test_url_key_identifies_variants():
+    assert bot.url_key("https://m.point.md/ro/stire/amp/?utm_source=tg") == bot.url_key("https://point.md/ro/stire")
+    assert bot.url_key("https://site.md/a?b=2&a=1") == bot.url_key("https://site.md/a?a=1&b=2")
+
+
+def article_page(number, canonical):
+    text = f"Articolul {number}: Guvernul a aprobat bugetul pentru anul viitor, cu bani pentru drumuri. " * 20
+    return (f'<html><head><meta charset="utf-8"><link rel="canonical" href="{canonical}"></head>'
+            f'<body><article><h1>Știrea {number}</h1><p>{text}</p></article></body></html>').encode('utf-8')
+
+
+class PortalHandler(BaseHTTPRequestHandler):
+    """Portal cu canonical-uri greșite: limba (/ro/) sau o pagină comună (/ro/stiri/ultima)."""
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        number = self.path.rstrip('/').rsplit('/', 1)[-1]
+        canonical = "/ro/" if self.path.startswith("/ro/stiri/") else "/ro/stiri/ultima"
+        body = article_page(number, canonical)
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+@pytest.fixture
+def portal(monkeypatch, tmp_path):
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), PortalHandler)
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    index_path = str(tmp_path / "url_index.json")
+    monkeypatch.setattr(bot, "url_aliases", bot.UrlAliasIndex(index_path, 100))
+    monkeypatch.setattr(bot, "prefetcher", bot.ArticlePrefetcher())
+    yield f"http://127.0.0.1:{httpd.server_address[1]}", index_path
+    httpd.shutdown()
+
+
+def test_parent_canonical_does_not_merge_articles(portal):
+    base, _ = portal
+    urls = [f"{base}/ro/stiri/123", f"{base}/ro/stiri/456"]
+    for url in urls:
+        assert "Articolul" in bot.fetch_article_content(url)
+    assert bot.dedupe_urls(urls) == urls
+    assert bot.url_aliases.resolve(urls[0]) == urls[0]
+    content = asyncio.run(bot.prefetcher.get(urls[1]))
+    assert "Articolul 456" in content
+
+
+def test_canonical_shared_by_two_pages_is_blocked(portal):
+    base, index_path = portal
+    urls = [f"{base}/arhiva/123", f"{base}/arhiva/456", f"{base}/arhiva/789"]
+    bot.fetch_article_content(urls[0])
+    assert bot.url_aliases.resolve(urls[0]) == f"{base}/ro/stiri/ultima"  # încă pare legitim
+    bot.fetch_article_content(urls[1])
+    bot.fetch_article_content(urls[2])
+    assert bot.dedupe_urls(urls) == urls
+    # Blocarea supraviețuiește repornirii
+    reloaded = bot.UrlAliasIndex(index_path, 100)
+    assert not reloaded.accept_declared(f"{base}/arhiva/999", f"{base}/ro/stiri/ultima")
+    assert reloaded.resolve(urls[0]) == urls[0]
+
+
+def test_fetch_uses_received_url_not_canonical(portal, monkeypatch):
+    base, _ = portal
+    bot.fetch_article_content(f"{base}/arhiva/123")
+    fetched = []
+    monkeypatch.setattr(bot, "fetch_article_content", lambda url: fetched.append(url) or "conținut")
+    asyncio.run(bot.prefetcher.get(f"{base}/arhiva/123?utm_source=tg"))
+    assert fetched == [f"{base}/arhiva/123"]